@@ -0,0 +1,317 @@
+# coding:utf-8
+
+"""
+benchmark.py
+
+Reproducible benchmarks of filetype_.py. The corpora are generated
+locally from the built-in signatures, from a fixed seed, so that two
+runs on the same machine measure the same inputs:
+
+    python benchmark.py -o before.json
+    python benchmark.py -o after.json --compare before.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+import filetype_
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# corpora
+
+def sample(kind, rng, size=512):
+    """
+    Returns a content matching the first signature of the given type,
+    padded with random bytes up to `size`.
+    """
+    sig = kind.SIGNATURES[0]
+    buf = bytearray(rng.getrandbits(8) for _ in range(max(size, sig.length)))
+    for offset, pattern, mask in sig.runs:
+        for i, byte in enumerate(pattern):
+            if mask is not None:
+                byte |= rng.getrandbits(8) & ~mask[i] & 0xFF
+            buf[offset + i] = byte
+    return bytes(buf)
+
+
+def near_miss(kind, rng, size=512):
+    # Same as sample() with the last byte of the first run flipped,
+    # so that every candidate is evaluated and none matches.
+    buf = bytearray(sample(kind, rng, size))
+    offset, pattern, _ = kind.SIGNATURES[0].runs[0]
+    buf[offset + len(pattern) - 1] ^= 0xFF
+    return bytes(buf)
+
+
+def docx(rng):
+    stash = io.BytesIO()
+    with zipfile.ZipFile(stash, 'w') as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('word/document.xml',
+                         bytes(rng.getrandbits(8) for _ in range(4096)))
+    return stash.getvalue()
+
+
+def corpora(seed):
+    """
+    Returns the named corpora, as lists of (label, content) tuples.
+    The label is the extension of the type the content was made for.
+    """
+    rng = random.Random(seed)
+    kinds = [kind for kind in filetype_.TYPES if kind.SIGNATURES]
+    return {
+        'known': [(kind.extension, sample(kind, rng)) for kind in kinds],
+        'near-miss': [(None, near_miss(kind, rng)) for kind in kinds],
+        'random': [(None, bytes(rng.getrandbits(8) for _ in range(512)))
+                   for _ in range(len(kinds))],
+        'text': [(None, ('line %d of a plain text file\n' % i).encode() * 20)
+                 for i in range(len(kinds))],
+        'zeros': [(None, bytes(512))] * len(kinds),
+        'short': [(None, bytes((i,))) for i in range(len(kinds))],
+    }
+
+
+def write_files(directory, corpus):
+    paths = []
+    for index, (label, content) in enumerate(corpus):
+        path = os.path.join(directory, '%04d.%s' % (index, label or 'bin'))
+        with open(path, 'wb') as fp:
+            fp.write(content)
+        paths.append(path)
+    return paths
+
+
+def check(corpus):
+    # Contents whose detected type is not the one they were made for,
+    # e.g. when a more specific signature overlaps.
+    return [(label, kind.extension if kind else None)
+            for label, kind in ((label, filetype_.guess(content))
+                                for label, content in corpus)
+            if label is not None and (kind is None or
+                                      not kind.is_extension(label))]
+
+
+# timing
+
+def measure(name, func, inputs, repeat, **info):
+    """
+    Calls func on every input, `repeat` times over, and returns the
+    per-call timings in nanoseconds.
+    """
+    func(inputs[0])
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for obj in inputs:
+            func(obj)
+        rounds.append((time.perf_counter_ns() - start) / len(inputs))
+    return dict(name=name, calls=len(inputs) * repeat,
+                min_ns=min(rounds), median_ns=statistics.median(rounds),
+                ops_per_sec=1e9 / min(rounds), **info)
+
+
+def measure_batch(name, func, count, repeat, **info):
+    """
+    Times `repeat` calls of func processing `count` items each.
+    """
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        func()
+        rounds.append(time.perf_counter_ns() - start)
+    return dict(name=name, items=count, min_ns=min(rounds) / count,
+                median_ns=statistics.median(rounds) / count,
+                ops_per_sec=1e9 * count / min(rounds), **info)
+
+
+def import_time(repeat, budget_ms):
+    """
+    Returns the time to import filetype_ in a fresh interpreter, and
+    the time of the first detection which builds the registry, in
+    nanoseconds.
+    """
+    code = ('import time; start = time.perf_counter_ns(); import filetype_; '
+            'end = time.perf_counter_ns(); filetype_.guess(b"GIF89a"); '
+            'print(end - start, time.perf_counter_ns() - end)')
+    imports, firsts = [], []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         cwd=HERE).split()
+        imports.append(int(output[0]))
+        firsts.append(int(output[1]))
+    budget_ns = budget_ms * 1e6
+    return [
+        dict(name='import', calls=repeat, min_ns=min(imports),
+             median_ns=statistics.median(imports),
+             ops_per_sec=1e9 / min(imports), budget_ns=budget_ns,
+             over_budget=statistics.median(imports) > budget_ns),
+        dict(name='first-guess', calls=repeat, min_ns=min(firsts),
+             median_ns=statistics.median(firsts),
+             ops_per_sec=1e9 / min(firsts)),
+    ]
+
+
+def rewound(fp):
+    fp.seek(0)
+    return filetype_.guess(fp)
+
+
+def run(args):
+    named = corpora(args.seed)
+    directory = tempfile.mkdtemp(prefix='filetype-bench-')
+    results = []
+    try:
+        for corpus, entries in sorted(named.items()):
+            os.mkdir(os.path.join(directory, corpus))
+            contents = [content for _, content in entries] * args.scale
+            paths = write_files(os.path.join(directory, corpus),
+                                entries) * args.scale
+            info = dict(corpus=corpus)
+
+            results.append(measure('guess[bytes]', filetype_.guess, contents,
+                                   args.repeat, **info))
+            results.append(measure('guess[memoryview]', filetype_.guess,
+                                   [memoryview(c) for c in contents],
+                                   args.repeat, **info))
+            results.append(measure('guess[file-like]', rewound,
+                                   [io.BytesIO(c) for c in contents],
+                                   args.repeat, **info))
+            results.append(measure('guess[path]', filetype_.guess, paths,
+                                   args.repeat, **info))
+            results.append(measure('guess_path[mmap]',
+                                   lambda path: filetype_.guess_path(
+                                       path, use_mmap=True),
+                                   paths, args.repeat, **info))
+
+        contents = [content for entries in named.values()
+                    for _, content in entries] * args.scale
+        paths = [os.path.join(root, name)
+                 for root, _, names in os.walk(directory)
+                 for name in names] * args.scale
+        info = dict(corpus='all')
+        results.append(measure_batch(
+            'guess_many[bytes]',
+            lambda: list(filetype_.guess_many(contents)),
+            len(contents), args.repeat, **info))
+        results.append(measure_batch(
+            'guess_many[path]', lambda: list(filetype_.guess_many(paths)),
+            len(paths), args.repeat, **info))
+        results.append(measure_batch(
+            'match_codes[python]',
+            lambda: filetype_.match_codes(contents, vectorize=False),
+            len(contents), args.repeat, **info))
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            pass
+        else:
+            results.append(measure_batch(
+                'match_codes[numpy]',
+                lambda: filetype_.match_codes(contents, vectorize=True),
+                len(contents), args.repeat, **info))
+        results.append(measure_batch(
+            'scan', lambda: list(filetype_.scan(directory)),
+            len(paths) // args.scale, args.repeat, **info))
+
+        deep = docx(random.Random(args.seed))
+        results.append(measure('guess_deep[docx]', filetype_.guess_deep,
+                               [deep] * 100, args.repeat, corpus='docx'))
+        results.extend(import_time(args.import_repeat, args.import_budget))
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'scale': args.scale,
+            'timestamp': int(time.time()),
+            'mismatches': check(named['known']),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Prints the change of every benchmark against the baseline ones.
+
+    Returns:
+        The number of benchmarks slower by more than `threshold`.
+    """
+    before = {(r['name'], r.get('corpus')): r for r in baseline['results']}
+    regressions = 0
+    for result in current['results']:
+        key = (result['name'], result.get('corpus'))
+        if key not in before:
+            continue
+        ratio = result['min_ns'] / before[key]['min_ns']
+        slower = ratio > 1 + threshold
+        regressions += slower
+        print('%-24s %-10s %12.0f -> %12.0f ns %+7.1f%%%s' % (
+            key[0], key[1] or '', before[key]['min_ns'], result['min_ns'],
+            (ratio - 1) * 100, '  REGRESSION' if slower else ''),
+            file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmarks filetype_.py on synthetic corpora.')
+    parser.add_argument('-o', '--output', help='write the JSON results '
+                        'to this file instead of stdout')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timed rounds per benchmark, the best is kept')
+    parser.add_argument('--scale', type=int, default=20,
+                        help='number of times each corpus is repeated')
+    parser.add_argument('--import-repeat', type=int, default=10)
+    parser.add_argument('--import-budget', type=float, default=5.0,
+                        metavar='MS', help='median import time above which '
+                        'the run fails, in milliseconds')
+    parser.add_argument('--compare', metavar='JSON',
+                        help='results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(output + '\n')
+    else:
+        print(output)
+
+    status = 0
+    for result in results['results']:
+        if result.get('over_budget'):
+            print('import takes %.2f ms, over the %.2f ms budget' % (
+                result['median_ns'] / 1e6, args.import_budget),
+                file=sys.stderr)
+            status = 1
+    if args.compare:
+        with open(args.compare) as fp:
+            if compare(results, json.load(fp), args.threshold):
+                status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,42 +5,305 @@ filetype_.py
 version = '0.0.1'
 by tacey@AtomPai on 18-7-3
 """
+import io
 import os
-import subprocess
+import sys
 
-FILE_EXIST = True
-try:
-    exe_info = subprocess.check_output(['file', "--version"])
-except OSError:
-    FILE_EXIST = False
-else:
-    if not exe_info.startswith('file-'):
-        FILE_EXIST = False
+_FILE_EXIST = None
+
+# Type codes of the built-in types are below, see Registry.code().
+FIRST_CUSTOM_CODE = 1024
+
+# Number of header bytes read for matchers that do not declare
+# how many they need, and the largest read made before knowing
+# the leading byte of the input.
+DEFAULT_HEADER_SIZE = 262
+
+
+def file_command_exists():
+    """
+    Checks whether the `file` command line tool is available.
+
+    The probe spawns `file --version` on first call only, the
+    result is cached for the lifetime of the process.
+
+    Returns:
+        True if the `file` tool can be executed. Otherwise False.
+    """
+    global _FILE_EXIST
+    if _FILE_EXIST is None:
+        import subprocess
+        try:
+            exe_info = subprocess.check_output(['file', "--version"],
+                                               stderr=subprocess.STDOUT)
+        except (OSError, subprocess.CalledProcessError):
+            _FILE_EXIST = False
+        else:
+            _FILE_EXIST = exe_info.startswith(b'file-')
+    return _FILE_EXIST
+
+
+def __getattr__(name):
+    # FILE_EXIST used to be probed at import time, keep it
+    # available as a lazily computed module attribute.
+    if name == 'FILE_EXIST':
+        return file_command_exists()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+class Signature(object):
+    """
+    Declarative description of a file header magic number.
+
+    A signature is made of one or more byte runs given as
+    ``(offset, pattern)`` or ``(offset, pattern, mask)`` tuples.
+    It matches a buffer holding at least `length` bytes in which
+    every run matches. Masked runs compare ``buf[i] & mask[j]``
+    against ``pattern[j]``.
+
+    Args:
+        *runs: (offset, pattern[, mask]) tuples.
+        min_length: minimum buffer size, defaults to the end
+            of the farthest run.
+    """
+
+    def __init__(self, *runs, min_length=0):
+        self.runs = tuple(sorted(
+            (run[0], bytes(run[1]),
+             bytes(run[2]) if len(run) > 2 and run[2] is not None else None)
+            for run in runs))
+        self.length = max([min_length] + [offset + len(pattern)
+                                          for offset, pattern, _ in self.runs])
+
+    def __repr__(self):
+        return 'Signature(%s)' % ', '.join(repr(run) for run in self.runs)
+
+    def leading_bytes(self):
+        """
+        Returns the set of first byte values this signature accepts.
+        """
+        for offset, pattern, mask in self.runs:
+            if offset == 0 and pattern:
+                if mask is None:
+                    return frozenset((pattern[0],))
+                return frozenset(b for b in range(256)
+                                 if b & mask[0] == pattern[0])
+        return frozenset(range(256))
+
+    def implies(self, other):
+        """
+        Returns True if every buffer matching this signature also
+        matches the other one, e.g. the Epub signature implies a Zip
+        one. Constraints spanning several runs of this signature are
+        not combined, which only makes the answer conservative.
+        """
+        if self.length < other.length:
+            return False
+        for offset, pattern, mask in other.runs:
+            end = offset + len(pattern)
+            for start, fixed, bits in self.runs:
+                if start <= offset and end <= start + len(fixed):
+                    break
+            else:
+                return False
+            if mask is None and bits is None:
+                if fixed[offset - start:end - start] != pattern:
+                    return False
+                continue
+            for i, byte in enumerate(pattern):
+                need = 0xFF if mask is None else mask[i]
+                have = 0xFF if bits is None else bits[offset - start + i]
+                if (have & need != need or
+                        (fixed[offset - start + i] ^ byte) & need):
+                    return False
+        return True
+
+    def check(self, buf, complete=False):
+        """
+        Matches a possibly incomplete buffer.
+
+        Args:
+            buf: the first bytes of the content.
+            complete: True if no more bytes will follow.
+
+        Returns:
+            True or False once decided, None if more bytes are needed.
+        """
+        size = len(buf)
+        pending = size < self.length
+        for offset, pattern, mask in self.runs:
+            end = min(offset + len(pattern), size)
+            if end < offset + len(pattern):
+                pending = True
+            if end <= offset:
+                continue
+            if mask is None:
+                if buf[offset:end] != pattern[:end - offset]:
+                    return False
+            elif any(buf[offset + i] & mask[i] != pattern[i]
+                     for i in range(end - offset)):
+                return False
+        if pending:
+            return False if complete else None
+        return True
+
+    def match(self, buf):
+        if len(buf) < self.length:
+            return False
+        for offset, pattern, mask in self.runs:
+            if mask is None:
+                if buf[offset:offset + len(pattern)] != pattern:
+                    return False
+            elif any(buf[offset + i] & m != p
+                     for i, (p, m) in enumerate(zip(pattern, mask))):
+                return False
+        return True
+
+
+def _compile_check(signatures):
+    """
+    Returns a function telling whether a buffer matches any of the
+    given signatures.
+
+    Alternatives made of a single unmasked run at the same offset,
+    such as the 9 Zip signatures, are checked with one slice compared
+    against the tuple of their patterns. Other unmasked signatures are
+    checked run by run in a single loop, masked ones by
+    `Signature.match()`.
+    """
+    signatures = tuple(signatures)
+    if any(mask is not None for sig in signatures for _, _, mask in sig.runs):
+        if len(signatures) == 1:
+            return signatures[0].match
+
+        def check(buf):
+            for sig in signatures:
+                if sig.match(buf):
+                    return True
+            return False
+        return check
+
+    shapes = set((sig.runs[0][0], len(sig.runs[0][1]), sig.length)
+                 if len(sig.runs) == 1 else None for sig in signatures)
+    if len(shapes) != 1 or None in shapes:
+        alternatives = tuple(
+            (sig.length, tuple((offset, offset + len(pattern), pattern)
+                               for offset, pattern, _ in sig.runs))
+            for sig in signatures)
+
+        def check(buf):
+            size = len(buf)
+            for length, runs in alternatives:
+                if size >= length:
+                    for offset, end, pattern in runs:
+                        if buf[offset:end] != pattern:
+                            break
+                    else:
+                        return True
+            return False
+        return check
+
+    offset, size, length = shapes.pop()
+    end = offset + size
+    patterns = tuple(sig.runs[0][1] for sig in signatures)
+    if length > end:
+        def check(buf):
+            return len(buf) >= length and buf[offset:end] in patterns
+    else:
+        def check(buf):
+            return buf[offset:end] in patterns
+    return check
+
+
+# Compiled signatures of each declarative Type subclass.
+_CHECKS = {}
 
 
 class Type(object):
+    """
+    Base file type matcher.
+
+    Subclasses describe their magic numbers as a tuple of alternative
+    `Signature` instances in `SIGNATURES`. Matchers that cannot be
+    expressed that way may override `match()` instead, and set
+    `HEADER_SIZE` to the number of header bytes they need.
+
+    `CODE` is the stable type code of the built-in types, see
+    `Registry.code()`. Subclasses declare empty `__slots__` so that
+    instances carry no attribute dict.
+    """
+    __slots__ = ('_mime', '_extension')
+    SIGNATURES = ()
+    ALIASES = ()
+    HEADER_SIZE = None
+    CODE = None
+
     def __init__(self, mime, extension):
-        self.__mime = mime
-        self.__extension = extension
+        self._mime = mime
+        self._extension = extension
 
     @property
     def mime(self):
-        return self.__mime
+        return self._mime
 
     @property
     def extension(self):
-        return self.__extension
+        return self._extension
 
     @property
-    def is_extension(self, extension):
-        return self.__extension is extension
+    def extensions(self):
+        """
+        All the extensions of this type, the canonical one first.
+        """
+        return (self._extension,) + tuple(self.ALIASES)
 
     @property
+    def header_size(self):
+        """
+        Number of header bytes this matcher needs: `HEADER_SIZE` if
+        set, else the length of its longest signature, or
+        DEFAULT_HEADER_SIZE for matchers overriding `match()`.
+        """
+        if self.HEADER_SIZE is not None:
+            return self.HEADER_SIZE
+        if type(self).match is not Type.match:
+            return DEFAULT_HEADER_SIZE
+        return max([sig.length for sig in self.SIGNATURES] or [0])
+
+    def is_extension(self, extension):
+        extension = _normalize_extension(extension)
+        return any(_normalize_extension(ext) == extension
+                   for ext in self.extensions)
+
     def is_mime(self, mime):
-        return self.__mime is mime
+        return _normalize_mime(mime) == _normalize_mime(self._mime)
 
     def match(self, buf):
-        raise NotImplementedError
+        check = _CHECKS.get(type(self))
+        if check is None:
+            check = _CHECKS[type(self)] = _compile_check(self.SIGNATURES)
+        return check(buf)
+
+    def check(self, buf, complete=False):
+        """
+        Matches a possibly incomplete header, see `Signature.check()`.
+
+        Matchers overriding `match()` can only be decided on
+        a complete header.
+
+        Returns:
+            True or False once decided, None if more bytes are needed.
+        """
+        if type(self).match is not Type.match:
+            return self.match(buf) if complete else None
+        result = False
+        for sig in self.SIGNATURES:
+            state = sig.check(buf, complete)
+            if state:
+                return True
+            if state is None:
+                result = None
+        return result
 
 
 # IMAGE
@@ -49,8 +312,14 @@ class Jpeg(Type):
     """
     Implements the JPEG image type matcher.
     """
+    __slots__ = ()
     MIME = 'image/jpeg'
     EXTENSION = 'jpg'
+    CODE = 1
+    ALIASES = ('jpeg',)
+    SIGNATURES = (
+        Signature((0, b'\xFF\xD8\xFF')),
+    )
 
     def __init__(self):
         super(Jpeg, self).__init__(
@@ -58,19 +327,18 @@ class Jpeg(Type):
             extension=Jpeg.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 2 and
-                buf[0] == 0xFF and
-                buf[1] == 0xD8 and
-                buf[2] == 0xFF)
-
 
 class Png(Type):
     """
     Implements the PNG image type matcher.
     """
+    __slots__ = ()
     MIME = 'image/png'
     EXTENSION = 'png'
+    CODE = 2
+    SIGNATURES = (
+        Signature((0, b'\x89PNG')),
+    )
 
     def __init__(self):
         super(Png, self).__init__(
@@ -78,20 +346,18 @@ class Png(Type):
             extension=Png.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x89 and
-                buf[1] == 0x50 and
-                buf[2] == 0x4E and
-                buf[3] == 0x47)
-
 
 class Gif(Type):
     """
     Implements the GIF image type matcher.
     """
+    __slots__ = ()
     MIME = 'image/gif'
     EXTENSION = 'gif'
+    CODE = 3
+    SIGNATURES = (
+        Signature((0, b'GIF')),
+    )
 
     def __init__(self):
         super(Gif, self).__init__(
@@ -99,19 +365,18 @@ class Gif(Type):
             extension=Gif.EXTENSION,
         )
 
-    def match(self, buf):
-        return (len(buf) > 2 and
-                buf[0] == 0x47 and
-                buf[1] == 0x49 and
-                buf[2] == 0x46)
-
 
 class Webp(Type):
     """
     Implements the WEBP image type matcher.
     """
+    __slots__ = ()
     MIME = 'image/webp'
     EXTENSION = 'webp'
+    CODE = 4
+    SIGNATURES = (
+        Signature((8, b'WEBP')),
+    )
 
     def __init__(self):
         super(Webp, self).__init__(
@@ -119,20 +384,19 @@ class Webp(Type):
             extension=Webp.EXTENSION,
         )
 
-    def match(self, buf):
-        return (len(buf) > 11 and
-                buf[8] == 0x57 and
-                buf[9] == 0x45 and
-                buf[10] == 0x42 and
-                buf[11] == 0x50)
-
 
 class Cr2(Type):
     """
     Implements the CR2 image type matcher.
     """
+    __slots__ = ()
     MIME = 'image/x-canon-cr2'
     EXTENSION = 'cr2'
+    CODE = 5
+    SIGNATURES = (
+        Signature((0, b'II*\x00'), (8, b'CR')),
+        Signature((0, b'MM\x00*'), (8, b'CR')),
+    )
 
     def __init__(self):
         super(Cr2, self).__init__(
@@ -140,21 +404,20 @@ class Cr2(Type):
             extension=Cr2.EXTENSION,
         )
 
-    def match(self, buf):
-        return (len(buf) > 9 and
-                ((buf[0] == 0x49 and buf[1] == 0x49 and
-                  buf[2] == 0x2A and buf[3] == 0x0) or
-                 (buf[0] == 0x4D and buf[1] == 0x4D and
-                  buf[2] == 0x0 and buf[3] == 0x2A)) and
-                buf[8] == 0x43 and buf[9] == 0x52)
-
 
 class Tiff(Type):
     """
     Implements the TIFF image type matcher.
     """
+    __slots__ = ()
     MIME = 'image/tiff'
     EXTENSION = 'tif'
+    CODE = 6
+    ALIASES = ('tiff',)
+    SIGNATURES = (
+        Signature((0, b'II*\x00')),
+        Signature((0, b'MM\x00*')),
+    )
 
     def __init__(self):
         super(Tiff, self).__init__(
@@ -162,20 +425,18 @@ class Tiff(Type):
             extension=Tiff.EXTENSION,
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                ((buf[0] == 0x49 and buf[1] == 0x49 and
-                  buf[2] == 0x2A and buf[3] == 0x0) or
-                 (buf[0] == 0x4D and buf[1] == 0x4D and
-                  buf[2] == 0x0 and buf[3] == 0x2A)))
-
 
 class Bmp(Type):
     """
     Implements the BMP image type matcher.
     """
+    __slots__ = ()
     MIME = 'image/bmp'
     EXTENSION = 'bmp'
+    CODE = 7
+    SIGNATURES = (
+        Signature((0, b'BM')),
+    )
 
     def __init__(self):
         super(Bmp, self).__init__(
@@ -183,18 +444,18 @@ class Bmp(Type):
             extension=Bmp.EXTENSION,
         )
 
-    def match(self, buf):
-        return (len(buf) > 1 and
-                buf[0] == 0x42 and
-                buf[1] == 0x4D)
-
 
 class Jxr(Type):
     """
     Implements the JXR image type matcher.
     """
+    __slots__ = ()
     MIME = 'image/vnd.ms-photo'
     EXTENSION = 'jxr'
+    CODE = 8
+    SIGNATURES = (
+        Signature((0, b'II\xBC')),
+    )
 
     def __init__(self):
         super(Jxr, self).__init__(
@@ -202,19 +463,18 @@ class Jxr(Type):
             extension=Jxr.EXTENSION,
         )
 
-    def match(self, buf):
-        return (len(buf) > 2 and
-                buf[0] == 0x49 and
-                buf[1] == 0x49 and
-                buf[2] == 0xBC)
-
 
 class Psd(Type):
     """
     Implements the PSD image type matcher.
     """
+    __slots__ = ()
     MIME = 'image/vnd.adobe.photoshop'
     EXTENSION = 'psd'
+    CODE = 9
+    SIGNATURES = (
+        Signature((0, b'8BPS')),
+    )
 
     def __init__(self):
         super(Psd, self).__init__(
@@ -222,20 +482,18 @@ class Psd(Type):
             extension=Psd.EXTENSION,
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x38 and
-                buf[1] == 0x42 and
-                buf[2] == 0x50 and
-                buf[3] == 0x53)
-
 
 class Ico(Type):
     """
     Implements the ICO image type matcher.
     """
+    __slots__ = ()
     MIME = 'image/x-icon'
     EXTENSION = 'ico'
+    CODE = 10
+    SIGNATURES = (
+        Signature((0, b'\x00\x00\x01\x00')),
+    )
 
     def __init__(self):
         super(Ico, self).__init__(
@@ -243,13 +501,6 @@ class Ico(Type):
             extension=Ico.EXTENSION,
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x00 and
-                buf[1] == 0x00 and
-                buf[2] == 0x01 and
-                buf[3] == 0x00)
-
 
 #  VIDEO
 
@@ -257,8 +508,16 @@ class Mp4(Type):
     """
     Implements the MP4 video type matcher.
     """
+    __slots__ = ()
     MIME = 'video/mp4'
     EXTENSION = 'mp4'
+    CODE = 11
+    SIGNATURES = (
+        Signature((0, b'\x00\x00\x00\x18ftyp'), min_length=28),
+        Signature((0, b'\x00\x00\x00\x20ftyp'), min_length=28),
+        Signature((0, b'3gp5'), min_length=28),
+        Signature((0, b'\x00\x00\x00\x1Cftypmp42'), (16, b'mp41mp42isom')),
+    )
 
     def __init__(self):
         super(Mp4, self).__init__(
@@ -266,37 +525,18 @@ class Mp4(Type):
             extension=Mp4.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 27 and
-                (buf[0] == 0x0 and buf[1] == 0x0 and
-                 buf[2] == 0x0 and
-                 ((buf[3] == 0x18 or
-                   buf[3] == 0x20) and
-                  buf[4] == 0x66 and
-                  buf[5] == 0x74 and buf[6] == 0x79 and
-                  buf[7] == 0x70) or
-                 (buf[0] == 0x33 and buf[1] == 0x67 and
-                  buf[2] == 0x70 and buf[3] == 0x35) or
-                 (buf[0] == 0x0 and buf[1] == 0x0 and
-                  buf[2] == 0x0 and buf[3] == 0x1C and
-                  buf[4] == 0x66 and buf[5] == 0x74 and
-                  buf[6] == 0x79 and buf[7] == 0x70 and
-                  buf[8] == 0x6D and buf[9] == 0x70 and
-                  buf[10] == 0x34 and buf[11] == 0x32 and
-                  buf[16] == 0x6D and buf[17] == 0x70 and
-                  buf[18] == 0x34 and buf[19] == 0x31 and
-                  buf[20] == 0x6D and buf[21] == 0x70 and
-                  buf[22] == 0x34 and buf[23] == 0x32 and
-                  buf[24] == 0x69 and buf[25] == 0x73 and
-                  buf[26] == 0x6F and buf[27] == 0x6D)))
-
 
 class M4v(Type):
     """
     Implements the M4V video type matcher.
     """
+    __slots__ = ()
     MIME = 'video/x-m4v'
     EXTENSION = 'm4v'
+    CODE = 12
+    SIGNATURES = (
+        Signature((0, b'\x00\x00\x00\x1CftypM4V')),
+    )
 
     def __init__(self):
         super(M4v, self).__init__(
@@ -304,22 +544,19 @@ class M4v(Type):
             extension=M4v.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 10 and
-                buf[0] == 0x0 and buf[1] == 0x0 and
-                buf[2] == 0x0 and buf[3] == 0x1C and
-                buf[4] == 0x66 and buf[5] == 0x74 and
-                buf[6] == 0x79 and buf[7] == 0x70 and
-                buf[8] == 0x4D and buf[9] == 0x34 and
-                buf[10] == 0x56)
-
 
 class Mkv(Type):
     """
     Implements the MKV video type matcher.
     """
+    __slots__ = ()
     MIME = 'video/x-matroska'
     EXTENSION = 'mkv'
+    CODE = 13
+    SIGNATURES = (
+        Signature((0, b'\x1A\x45\xDF\xA3\x93\x42\x82\x88matroska')),
+        Signature((31, b'matroska')),
+    )
 
     def __init__(self):
         super(Mkv, self).__init__(
@@ -327,29 +564,18 @@ class Mkv(Type):
             extension=Mkv.EXTENSION
         )
 
-    def match(self, buf):
-        return ((len(buf) > 15 and
-                 buf[0] == 0x1A and buf[1] == 0x45 and
-                 buf[2] == 0xDF and buf[3] == 0xA3 and
-                 buf[4] == 0x93 and buf[5] == 0x42 and
-                 buf[6] == 0x82 and buf[7] == 0x88 and
-                 buf[8] == 0x6D and buf[9] == 0x61 and
-                 buf[10] == 0x74 and buf[11] == 0x72 and
-                 buf[12] == 0x6F and buf[13] == 0x73 and
-                 buf[14] == 0x6B and buf[15] == 0x61) or
-                (len(buf) > 38 and
-                 buf[31] == 0x6D and buf[32] == 0x61 and
-                 buf[33] == 0x74 and buf[34] == 0x72 and
-                 buf[35] == 0x6f and buf[36] == 0x73 and
-                 buf[37] == 0x6B and buf[38] == 0x61))
-
 
 class Webm(Type):
     """
     Implements the WebM video type matcher.
     """
+    __slots__ = ()
     MIME = 'video/webm'
     EXTENSION = 'webm'
+    CODE = 14
+    SIGNATURES = (
+        Signature((0, b'\x1A\x45\xDF\xA3')),
+    )
 
     def __init__(self):
         super(Webm, self).__init__(
@@ -357,20 +583,18 @@ class Webm(Type):
             extension=Webm.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x1A and
-                buf[1] == 0x45 and
-                buf[2] == 0xDF and
-                buf[3] == 0xA3)
-
 
 class Mov(Type):
     """
     Implements the MOV video type matcher.
     """
+    __slots__ = ()
     MIME = 'video/quicktime'
     EXTENSION = 'mov'
+    CODE = 15
+    SIGNATURES = (
+        Signature((0, b'\x00\x00\x00\x14ftyp')),
+    )
 
     def __init__(self):
         super(Mov, self).__init__(
@@ -378,24 +602,18 @@ class Mov(Type):
             extension=Mov.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 7 and
-                buf[0] == 0x0 and
-                buf[1] == 0x0 and
-                buf[2] == 0x0 and
-                buf[3] == 0x14 and
-                buf[4] == 0x66 and
-                buf[5] == 0x74 and
-                buf[6] == 0x79 and
-                buf[7] == 0x70)
-
 
 class Avi(Type):
     """
     Implements the AVI video type matcher.
     """
+    __slots__ = ()
     MIME = 'video/x-msvideo'
     EXTENSION = 'avi'
+    CODE = 16
+    SIGNATURES = (
+        Signature((0, b'RIFF'), (8, b'AVI')),
+    )
 
     def __init__(self):
         super(Avi, self).__init__(
@@ -403,23 +621,18 @@ class Avi(Type):
             extension=Avi.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 10 and
-                buf[0] == 0x52 and
-                buf[1] == 0x49 and
-                buf[2] == 0x46 and
-                buf[3] == 0x46 and
-                buf[8] == 0x41 and
-                buf[9] == 0x56 and
-                buf[10] == 0x49)
-
 
 class Wmv(Type):
     """
     Implements the WMV video type matcher.
     """
+    __slots__ = ()
     MIME = 'video/x-ms-wmv'
     EXTENSION = 'wmv'
+    CODE = 17
+    SIGNATURES = (
+        Signature((0, b'\x30\x26\xB2\x75\x8E\x66\xCF\x11\xA6\xD9')),
+    )
 
     def __init__(self):
         super(Wmv, self).__init__(
@@ -427,26 +640,18 @@ class Wmv(Type):
             extension=Wmv.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 9 and
-                buf[0] == 0x30 and
-                buf[1] == 0x26 and
-                buf[2] == 0xB2 and
-                buf[3] == 0x75 and
-                buf[4] == 0x8E and
-                buf[5] == 0x66 and
-                buf[6] == 0xCF and
-                buf[7] == 0x11 and
-                buf[8] == 0xA6 and
-                buf[9] == 0xD9)
-
 
 class Flv(Type):
     """
     Implements the FLV video type matcher.
     """
+    __slots__ = ()
     MIME = 'video/x-flv'
     EXTENSION = 'flv'
+    CODE = 18
+    SIGNATURES = (
+        Signature((0, b'FLV\x01')),
+    )
 
     def __init__(self):
         super(Flv, self).__init__(
@@ -454,20 +659,19 @@ class Flv(Type):
             extension=Flv.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x46 and
-                buf[1] == 0x4C and
-                buf[2] == 0x56 and
-                buf[3] == 0x01)
-
 
 class Mpeg(Type):
     """
     Implements the MPEG video type matcher.
     """
+    __slots__ = ()
     MIME = 'video/mpeg'
     EXTENSION = 'mpg'
+    CODE = 19
+    ALIASES = ('mpeg',)
+    SIGNATURES = (
+        Signature((0, b'\x00\x00\x01\xB0', b'\xFF\xFF\xFF\xF0')),
+    )
 
     def __init__(self):
         super(Mpeg, self).__init__(
@@ -475,14 +679,6 @@ class Mpeg(Type):
             extension=Mpeg.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x0 and
-                buf[1] == 0x0 and
-                buf[2] == 0x1 and
-                buf[3] >= 0xb0 and
-                buf[3] <= 0xbf)
-
 
 # AUDIO
 
@@ -490,8 +686,14 @@ class Midi(Type):
     """
     Implements the Midi audio type matcher.
     """
+    __slots__ = ()
     MIME = 'audio/midi'
     EXTENSION = 'midi'
+    CODE = 20
+    ALIASES = ('mid',)
+    SIGNATURES = (
+        Signature((0, b'MThd')),
+    )
 
     def __init__(self):
         super(Midi, self).__init__(
@@ -499,20 +701,19 @@ class Midi(Type):
             extension=Midi.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x4D and
-                buf[1] == 0x54 and
-                buf[2] == 0x68 and
-                buf[3] == 0x64)
-
 
 class Mp3(Type):
     """
     Implements the MP3 audio type matcher.
     """
+    __slots__ = ()
     MIME = 'audio/mpeg'
     EXTENSION = 'mp3'
+    CODE = 21
+    SIGNATURES = (
+        Signature((0, b'ID3')),
+        Signature((0, b'\xFF\xFB'), min_length=3),
+    )
 
     def __init__(self):
         super(Mp3, self).__init__(
@@ -520,21 +721,19 @@ class Mp3(Type):
             extension=Mp3.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 2 and
-                ((buf[0] == 0x49 and
-                  buf[1] == 0x44 and
-                  buf[2] == 0x33) or
-                 (buf[0] == 0xFF and
-                  buf[1] == 0xfb)))
-
 
 class M4a(Type):
     """
     Implements the M4A audio type matcher.
     """
+    __slots__ = ()
     MIME = 'audio/m4a'
     EXTENSION = 'm4a'
+    CODE = 22
+    SIGNATURES = (
+        Signature((4, b'ftypM4A')),
+        Signature((0, b'M4A '), min_length=11),
+    )
 
     def __init__(self):
         super(M4a, self).__init__(
@@ -542,27 +741,18 @@ class M4a(Type):
             extension=M4a.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 10 and
-                ((buf[4] == 0x66 and
-                  buf[5] == 0x74 and
-                  buf[6] == 0x79 and
-                  buf[7] == 0x70 and
-                  buf[8] == 0x4D and
-                  buf[9] == 0x34 and
-                  buf[10] == 0x41) or
-                 (buf[0] == 0x4D and
-                  buf[1] == 0x34 and
-                  buf[2] == 0x41 and
-                  buf[3] == 0x20)))
-
 
 class Ogg(Type):
     """
     Implements the OGG audio type matcher.
     """
+    __slots__ = ()
     MIME = 'audio/ogg'
     EXTENSION = 'ogg'
+    CODE = 23
+    SIGNATURES = (
+        Signature((0, b'OggS')),
+    )
 
     def __init__(self):
         super(Ogg, self).__init__(
@@ -570,20 +760,18 @@ class Ogg(Type):
             extension=Ogg.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x4F and
-                buf[1] == 0x67 and
-                buf[2] == 0x67 and
-                buf[3] == 0x53)
-
 
 class Flac(Type):
     """
     Implements the FLAC audio type matcher.
     """
+    __slots__ = ()
     MIME = 'audio/x-flac'
     EXTENSION = 'flac'
+    CODE = 24
+    SIGNATURES = (
+        Signature((0, b'fLaC')),
+    )
 
     def __init__(self):
         super(Flac, self).__init__(
@@ -591,20 +779,18 @@ class Flac(Type):
             extension=Flac.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x66 and
-                buf[1] == 0x4C and
-                buf[2] == 0x61 and
-                buf[3] == 0x43)
-
 
 class Wav(Type):
     """
     Implements the WAV audio type matcher.
     """
+    __slots__ = ()
     MIME = 'audio/x-wav'
     EXTENSION = 'wav'
+    CODE = 25
+    SIGNATURES = (
+        Signature((0, b'RIFF'), (8, b'WAVE')),
+    )
 
     def __init__(self):
         super(Wav, self).__init__(
@@ -612,24 +798,18 @@ class Wav(Type):
             extension=Wav.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 11 and
-                buf[0] == 0x52 and
-                buf[1] == 0x49 and
-                buf[2] == 0x46 and
-                buf[3] == 0x46 and
-                buf[8] == 0x57 and
-                buf[9] == 0x41 and
-                buf[10] == 0x56 and
-                buf[11] == 0x45)
-
 
 class Amr(Type):
     """
     Implements the AMR audio type matcher.
     """
+    __slots__ = ()
     MIME = 'audio/amr'
     EXTENSION = 'amr'
+    CODE = 26
+    SIGNATURES = (
+        Signature((0, b'#!AMR\n'), min_length=12),
+    )
 
     def __init__(self):
         super(Amr, self).__init__(
@@ -637,15 +817,6 @@ class Amr(Type):
             extension=Amr.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 11 and
-                buf[0] == 0x23 and
-                buf[1] == 0x21 and
-                buf[2] == 0x41 and
-                buf[3] == 0x4D and
-                buf[4] == 0x52 and
-                buf[5] == 0x0A)
-
 
 # FONT
 
@@ -653,8 +824,13 @@ class Woff(Type):
     """
     Implements the WOFF font type matcher.
     """
+    __slots__ = ()
     MIME = 'application/font-woff'
     EXTENSION = 'woff'
+    CODE = 27
+    SIGNATURES = (
+        Signature((0, b'wOFF\x00\x01\x00\x00')),
+    )
 
     def __init__(self):
         super(Woff, self).__init__(
@@ -662,24 +838,18 @@ class Woff(Type):
             extension=Woff.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 7 and
-                buf[0] == 0x77 and
-                buf[1] == 0x4F and
-                buf[2] == 0x46 and
-                buf[3] == 0x46 and
-                buf[4] == 0x00 and
-                buf[5] == 0x01 and
-                buf[6] == 0x00 and
-                buf[7] == 0x00)
-
 
 class Woff2(Type):
     """
     Implements the WOFF2 font type matcher.
     """
+    __slots__ = ()
     MIME = 'application/font-woff'
     EXTENSION = 'woff2'
+    CODE = 28
+    SIGNATURES = (
+        Signature((0, b'wOF2\x00\x01\x00\x00')),
+    )
 
     def __init__(self):
         super(Woff2, self).__init__(
@@ -687,24 +857,18 @@ class Woff2(Type):
             extension=Woff2.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 7 and
-                buf[0] == 0x77 and
-                buf[1] == 0x4F and
-                buf[2] == 0x46 and
-                buf[3] == 0x32 and
-                buf[4] == 0x00 and
-                buf[5] == 0x01 and
-                buf[6] == 0x00 and
-                buf[7] == 0x00)
-
 
 class Ttf(Type):
     """
     Implements the TTF font type matcher.
     """
+    __slots__ = ()
     MIME = 'application/font-sfnt'
     EXTENSION = 'ttf'
+    CODE = 29
+    SIGNATURES = (
+        Signature((0, b'\x00\x01\x00\x00\x00')),
+    )
 
     def __init__(self):
         super(Ttf, self).__init__(
@@ -712,21 +876,18 @@ class Ttf(Type):
             extension=Ttf.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 4 and
-                buf[0] == 0x00 and
-                buf[1] == 0x01 and
-                buf[2] == 0x00 and
-                buf[3] == 0x00 and
-                buf[4] == 0x00)
-
 
 class Otf(Type):
     """
     Implements the OTF font type matcher.
     """
+    __slots__ = ()
     MIME = 'application/font-sfnt'
     EXTENSION = 'otf'
+    CODE = 30
+    SIGNATURES = (
+        Signature((0, b'OTTO\x00')),
+    )
 
     def __init__(self):
         super(Otf, self).__init__(
@@ -734,14 +895,6 @@ class Otf(Type):
             extension=Otf.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 4 and
-                buf[0] == 0x4F and
-                buf[1] == 0x54 and
-                buf[2] == 0x54 and
-                buf[3] == 0x4F and
-                buf[4] == 0x00)
-
 
 # ARCHIVE 压缩包
 
@@ -750,8 +903,13 @@ class Epub(Type):
     """
     Implements the EPUB archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/epub+zip'
     EXTENSION = 'epub'
+    CODE = 31
+    SIGNATURES = (
+        Signature((0, b'PK\x03\x04'), (30, b'mimetypeapplication/epub+zip')),
+    )
 
     def __init__(self):
         super(Epub, self).__init__(
@@ -759,32 +917,20 @@ class Epub(Type):
             extension=Epub.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 57 and
-                buf[0] == 0x50 and buf[1] == 0x4B and
-                buf[2] == 0x3 and buf[3] == 0x4 and
-                buf[30] == 0x6D and buf[31] == 0x69 and
-                buf[32] == 0x6D and buf[33] == 0x65 and
-                buf[34] == 0x74 and buf[35] == 0x79 and
-                buf[36] == 0x70 and buf[37] == 0x65 and
-                buf[38] == 0x61 and buf[39] == 0x70 and
-                buf[40] == 0x70 and buf[41] == 0x6C and
-                buf[42] == 0x69 and buf[43] == 0x63 and
-                buf[44] == 0x61 and buf[45] == 0x74 and
-                buf[46] == 0x69 and buf[47] == 0x6F and
-                buf[48] == 0x6E and buf[49] == 0x2F and
-                buf[50] == 0x65 and buf[51] == 0x70 and
-                buf[52] == 0x75 and buf[53] == 0x62 and
-                buf[54] == 0x2B and buf[55] == 0x7A and
-                buf[56] == 0x69 and buf[57] == 0x70)
-
 
 class Zip(Type):
     """
     Implements the Zip archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/zip'
     EXTENSION = 'zip'
+    CODE = 32
+    SIGNATURES = tuple(
+        Signature((0, b'PK' + bytes((third, fourth))))
+        for third in (0x3, 0x5, 0x7)
+        for fourth in (0x4, 0x6, 0x8)
+    )
 
     def __init__(self):
         super(Zip, self).__init__(
@@ -792,21 +938,18 @@ class Zip(Type):
             extension=Zip.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x50 and buf[1] == 0x4B and
-                (buf[2] == 0x3 or buf[2] == 0x5 or
-                 buf[2] == 0x7) and
-                (buf[3] == 0x4 or buf[3] == 0x6 or
-                 buf[3] == 0x8))
-
 
 class Tar(Type):
     """
     Implements the Tar archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-tar'
     EXTENSION = 'tar'
+    CODE = 33
+    SIGNATURES = (
+        Signature((257, b'ustar')),
+    )
 
     def __init__(self):
         super(Tar, self).__init__(
@@ -814,21 +957,19 @@ class Tar(Type):
             extension=Tar.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 261 and
-                buf[257] == 0x75 and
-                buf[258] == 0x73 and
-                buf[259] == 0x74 and
-                buf[260] == 0x61 and
-                buf[261] == 0x72)
-
 
 class Rar(Type):
     """
     Implements the RAR archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-rar-compressed'
     EXTENSION = 'rar'
+    CODE = 34
+    SIGNATURES = (
+        Signature((0, b'Rar!\x1A\x07\x00')),
+        Signature((0, b'Rar!\x1A\x07\x01')),
+    )
 
     def __init__(self):
         super(Rar, self).__init__(
@@ -836,24 +977,18 @@ class Rar(Type):
             extension=Rar.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 6 and
-                buf[0] == 0x52 and
-                buf[1] == 0x61 and
-                buf[2] == 0x72 and
-                buf[3] == 0x21 and
-                buf[4] == 0x1A and
-                buf[5] == 0x7 and
-                (buf[6] == 0x0 or
-                 buf[6] == 0x1))
-
 
 class Gz(Type):
     """
     Implements the GZ archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/gzip'
     EXTENSION = 'gz'
+    CODE = 35
+    SIGNATURES = (
+        Signature((0, b'\x1F\x8B\x08')),
+    )
 
     def __init__(self):
         super(Gz, self).__init__(
@@ -861,19 +996,18 @@ class Gz(Type):
             extension=Gz.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 2 and
-                buf[0] == 0x1F and
-                buf[1] == 0x8B and
-                buf[2] == 0x8)
-
 
 class Bz2(Type):
     """
     Implements the BZ2 archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-bzip2'
     EXTENSION = 'bz2'
+    CODE = 36
+    SIGNATURES = (
+        Signature((0, b'BZh')),
+    )
 
     def __init__(self):
         super(Bz2, self).__init__(
@@ -881,19 +1015,18 @@ class Bz2(Type):
             extension=Bz2.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 2 and
-                buf[0] == 0x42 and
-                buf[1] == 0x5A and
-                buf[2] == 0x68)
-
 
 class SevenZ(Type):
     """
     Implements the SevenZ (7z) archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-7z-compressed'
     EXTENSION = '7z'
+    CODE = 37
+    SIGNATURES = (
+        Signature((0, b'7z\xBC\xAF\x27\x1C')),
+    )
 
     def __init__(self):
         super(SevenZ, self).__init__(
@@ -901,22 +1034,18 @@ class SevenZ(Type):
             extension=SevenZ.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 5 and
-                buf[0] == 0x37 and
-                buf[1] == 0x7A and
-                buf[2] == 0xBC and
-                buf[3] == 0xAF and
-                buf[4] == 0x27 and
-                buf[5] == 0x1C)
-
 
 class Pdf(Type):
     """
     Implements the PDF archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/pdf'
     EXTENSION = 'pdf'
+    CODE = 38
+    SIGNATURES = (
+        Signature((0, b'%PDF')),
+    )
 
     def __init__(self):
         super(Pdf, self).__init__(
@@ -924,20 +1053,18 @@ class Pdf(Type):
             extension=Pdf.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x25 and
-                buf[1] == 0x50 and
-                buf[2] == 0x44 and
-                buf[3] == 0x46)
-
 
 class Exe(Type):
     """
     Implements the EXE archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-msdownload'
     EXTENSION = 'exe'
+    CODE = 39
+    SIGNATURES = (
+        Signature((0, b'MZ')),
+    )
 
     def __init__(self):
         super(Exe, self).__init__(
@@ -945,18 +1072,19 @@ class Exe(Type):
             extension=Exe.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 1 and
-                buf[0] == 0x4D and
-                buf[1] == 0x5A)
-
 
 class Swf(Type):
     """
     Implements the SWF archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-shockwave-flash'
     EXTENSION = 'swf'
+    CODE = 40
+    SIGNATURES = (
+        Signature((0, b'CWS')),
+        Signature((0, b'FWS')),
+    )
 
     def __init__(self):
         super(Swf, self).__init__(
@@ -964,20 +1092,18 @@ class Swf(Type):
             extension=Swf.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 2 and
-                (buf[0] == 0x43 or
-                 buf[0] == 0x46) and
-                buf[1] == 0x57 and
-                buf[2] == 0x53)
-
 
 class Rtf(Type):
     """
     Implements the RTF archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/rtf'
     EXTENSION = 'rtf'
+    CODE = 41
+    SIGNATURES = (
+        Signature((0, b'{\\rtf')),
+    )
 
     def __init__(self):
         super(Rtf, self).__init__(
@@ -985,21 +1111,18 @@ class Rtf(Type):
             extension=Rtf.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 4 and
-                buf[0] == 0x7B and
-                buf[1] == 0x5C and
-                buf[2] == 0x72 and
-                buf[3] == 0x74 and
-                buf[4] == 0x66)
-
 
 class Nes(Type):
     """
     Implements the NES archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-nintendo-nes-rom'
     EXTENSION = 'nes'
+    CODE = 42
+    SIGNATURES = (
+        Signature((0, b'NES\x1A')),
+    )
 
     def __init__(self):
         super(Nes, self).__init__(
@@ -1007,20 +1130,18 @@ class Nes(Type):
             extension=Nes.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x4E and
-                buf[1] == 0x45 and
-                buf[2] == 0x53 and
-                buf[3] == 0x1A)
-
 
 class Crx(Type):
     """
     Implements the CRX archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-google-chrome-extension'
     EXTENSION = 'crx'
+    CODE = 43
+    SIGNATURES = (
+        Signature((0, b'Cr24')),
+    )
 
     def __init__(self):
         super(Crx, self).__init__(
@@ -1028,20 +1149,19 @@ class Crx(Type):
             extension=Crx.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x43 and
-                buf[1] == 0x72 and
-                buf[2] == 0x32 and
-                buf[3] == 0x34)
-
 
 class Cab(Type):
     """
     Implements the CAB archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/vnd.ms-cab-compressed'
     EXTENSION = 'cab'
+    CODE = 44
+    SIGNATURES = (
+        Signature((0, b'MSCF')),
+        Signature((0, b'ISc(')),
+    )
 
     def __init__(self):
         super(Cab, self).__init__(
@@ -1049,24 +1169,20 @@ class Cab(Type):
             extension=Cab.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                ((buf[0] == 0x4D and
-                  buf[1] == 0x53 and
-                  buf[2] == 0x43 and
-                  buf[3] == 0x46) or
-                 (buf[0] == 0x49 and
-                  buf[1] == 0x53 and
-                  buf[2] == 0x63 and
-                  buf[3] == 0x28)))
-
 
 class Eot(Type):
     """
     Implements the EOT archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/octet-stream'
     EXTENSION = 'eot'
+    CODE = 45
+    SIGNATURES = (
+        Signature((8, b'\x02\x00\x01'), (34, b'LP')),
+        Signature((8, b'\x01\x00\x00'), (34, b'LP')),
+        Signature((8, b'\x02\x00\x02'), (34, b'LP')),
+    )
 
     def __init__(self):
         super(Eot, self).__init__(
@@ -1074,27 +1190,18 @@ class Eot(Type):
             extension=Eot.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 35 and
-                buf[34] == 0x4C and
-                buf[35] == 0x50 and
-                ((buf[8] == 0x02 and
-                  buf[9] == 0x00 and
-                  buf[10] == 0x01) or
-                 (buf[8] == 0x01 and
-                  buf[9] == 0x00 and
-                  buf[10] == 0x00) or
-                 (buf[8] == 0x02 and
-                  buf[9] == 0x00 and
-                  buf[10] == 0x02)))
-
 
 class Ps(Type):
     """
     Implements the PS archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/postscript'
     EXTENSION = 'ps'
+    CODE = 46
+    SIGNATURES = (
+        Signature((0, b'%!')),
+    )
 
     def __init__(self):
         super(Ps, self).__init__(
@@ -1102,18 +1209,18 @@ class Ps(Type):
             extension=Ps.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 1 and
-                buf[0] == 0x25 and
-                buf[1] == 0x21)
-
 
 class Xz(Type):
     """
     Implements the XS archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-xz'
     EXTENSION = 'xz'
+    CODE = 47
+    SIGNATURES = (
+        Signature((0, b'\xFD7zXZ\x00')),
+    )
 
     def __init__(self):
         super(Xz, self).__init__(
@@ -1121,22 +1228,18 @@ class Xz(Type):
             extension=Xz.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 5 and
-                buf[0] == 0xFD and
-                buf[1] == 0x37 and
-                buf[2] == 0x7A and
-                buf[3] == 0x58 and
-                buf[4] == 0x5A and
-                buf[5] == 0x00)
-
 
 class Sqlite(Type):
     """
     Implements the Sqlite DB archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-sqlite3'
     EXTENSION = 'sqlite'
+    CODE = 48
+    SIGNATURES = (
+        Signature((0, b'SQLi')),
+    )
 
     def __init__(self):
         super(Sqlite, self).__init__(
@@ -1144,20 +1247,18 @@ class Sqlite(Type):
             extension=Sqlite.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x53 and
-                buf[1] == 0x51 and
-                buf[2] == 0x4C and
-                buf[3] == 0x69)
-
 
 class Deb(Type):
     """
     Implements the DEB archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-deb'
     EXTENSION = 'deb'
+    CODE = 49
+    SIGNATURES = (
+        Signature((0, b'!<arch>\ndebian-binary')),
+    )
 
     def __init__(self):
         super(Deb, self).__init__(
@@ -1165,37 +1266,18 @@ class Deb(Type):
             extension=Deb.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 20 and
-                buf[0] == 0x21 and
-                buf[1] == 0x3C and
-                buf[2] == 0x61 and
-                buf[3] == 0x72 and
-                buf[4] == 0x63 and
-                buf[5] == 0x68 and
-                buf[6] == 0x3E and
-                buf[7] == 0x0A and
-                buf[8] == 0x64 and
-                buf[9] == 0x65 and
-                buf[10] == 0x62 and
-                buf[11] == 0x69 and
-                buf[12] == 0x61 and
-                buf[13] == 0x6E and
-                buf[14] == 0x2D and
-                buf[15] == 0x62 and
-                buf[16] == 0x69 and
-                buf[17] == 0x6E and
-                buf[18] == 0x61 and
-                buf[19] == 0x72 and
-                buf[20] == 0x79)
-
 
 class Ar(Type):
     """
     Implements the AR archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-unix-archive'
     EXTENSION = 'ar'
+    CODE = 50
+    SIGNATURES = (
+        Signature((0, b'!<arch>')),
+    )
 
     def __init__(self):
         super(Ar, self).__init__(
@@ -1203,23 +1285,19 @@ class Ar(Type):
             extension=Ar.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 6 and
-                buf[0] == 0x21 and
-                buf[1] == 0x3C and
-                buf[2] == 0x61 and
-                buf[3] == 0x72 and
-                buf[4] == 0x63 and
-                buf[5] == 0x68 and
-                buf[6] == 0x3E)
-
 
 class Z(Type):
     """
     Implements the Z archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-compress'
     EXTENSION = 'Z'
+    CODE = 51
+    SIGNATURES = (
+        Signature((0, b'\x1F\xA0')),
+        Signature((0, b'\x1F\x9D')),
+    )
 
     def __init__(self):
         super(Z, self).__init__(
@@ -1227,20 +1305,18 @@ class Z(Type):
             extension=Z.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 1 and
-                ((buf[0] == 0x1F and
-                  buf[1] == 0xA0) or
-                 (buf[0] == 0x1F and
-                  buf[1] == 0x9D)))
-
 
 class Lz(Type):
     """
     Implements the Lz archive type matcher.
     """
+    __slots__ = ()
     MIME = 'application/x-lzip'
     EXTENSION = 'lz'
+    CODE = 52
+    SIGNATURES = (
+        Signature((0, b'LZIP')),
+    )
 
     def __init__(self):
         super(Lz, self).__init__(
@@ -1248,174 +1324,2580 @@ class Lz(Type):
             extension=Lz.EXTENSION
         )
 
-    def match(self, buf):
-        return (len(buf) > 3 and
-                buf[0] == 0x4C and
-                buf[1] == 0x5A and
-                buf[2] == 0x49 and
-                buf[3] == 0x50)
 
+class Jar(Type):
+    """
+    Implements the JAR archive type matcher.
+    Only detected by deep inspection, see `guess_deep()`.
+    """
+    __slots__ = ()
+    MIME = 'application/java-archive'
+    EXTENSION = 'jar'
+    CODE = 53
 
-TYPES = [v() for v in locals().values() if type(v) == type(object) and issubclass(v, Type) and v != Type]
+    def __init__(self):
+        super(Jar, self).__init__(
+            mime=Jar.MIME,
+            extension=Jar.EXTENSION
+        )
 
 
-# utils
+class Apk(Type):
+    """
+    Implements the APK archive type matcher.
+    Only detected by deep inspection, see `guess_deep()`.
+    """
+    __slots__ = ()
+    MIME = 'application/vnd.android.package-archive'
+    EXTENSION = 'apk'
+    CODE = 54
 
-def get_sig_by_path(path):
-    with open(path, 'rb') as fp:
-        return bytearray(fp.read(262))
+    def __init__(self):
+        super(Apk, self).__init__(
+            mime=Apk.MIME,
+            extension=Apk.EXTENSION
+        )
 
 
-def get_sig_by_file_like(file_obj):
-    byte = bytearray(file_obj.read(262))
-    if byte:
-        return byte
-    elif hasattr(file_obj, 'getvalue'):
-        return bytearray(file_obj.getvalue())[:262]
+# DOCUMENT
 
+class Doc(Type):
+    """
+    Implements the DOC document type matcher.
+    Only detected by deep inspection, see `guess_deep()`.
+    """
+    __slots__ = ()
+    MIME = 'application/msword'
+    EXTENSION = 'doc'
+    CODE = 55
 
-def get_sig_by_str_like(str_obj):
-    return bytearray(str_obj)[:262]
+    def __init__(self):
+        super(Doc, self).__init__(
+            mime=Doc.MIME,
+            extension=Doc.EXTENSION
+        )
 
 
-def signature(array):
+class Xls(Type):
     """
-    Returns the first 262 bytes of the given bytearray
-    as part of the file header signature.
+    Implements the XLS document type matcher.
+    Only detected by deep inspection, see `guess_deep()`.
+    """
+    __slots__ = ()
+    MIME = 'application/vnd.ms-excel'
+    EXTENSION = 'xls'
+    CODE = 56
 
-    Args:
-        array: bytearray to extract the header signature.
+    def __init__(self):
+        super(Xls, self).__init__(
+            mime=Xls.MIME,
+            extension=Xls.EXTENSION
+        )
 
-    Returns:
-        First 262 bytes of the file content as bytearray type.
+
+class Ppt(Type):
     """
-    length = len(array)
-    index = 262 if length > 262 else length
+    Implements the PPT document type matcher.
+    Only detected by deep inspection, see `guess_deep()`.
+    """
+    __slots__ = ()
+    MIME = 'application/vnd.ms-powerpoint'
+    EXTENSION = 'ppt'
+    CODE = 57
 
-    return array[:index]
+    def __init__(self):
+        super(Ppt, self).__init__(
+            mime=Ppt.MIME,
+            extension=Ppt.EXTENSION
+        )
 
 
-def get_bytes(obj):
+class Docx(Type):
     """
-    Infers the input type and reads the first 262 bytes,
-    returning a sliced bytearray.
+    Implements the DOCX document type matcher.
+    Only detected by deep inspection, see `guess_deep()`.
+    """
+    __slots__ = ()
+    MIME = ('application/vnd.openxmlformats-officedocument.'
+            'wordprocessingml.document')
+    EXTENSION = 'docx'
+    CODE = 58
 
-    Args:
-        obj: path to file, bytes or bytearray.
+    def __init__(self):
+        super(Docx, self).__init__(
+            mime=Docx.MIME,
+            extension=Docx.EXTENSION
+        )
 
-    Returns:
-        First 262 bytes of the file content as bytearray type.
 
-    Raises:
-        TypeError: if obj is not a supported type.
+class Xlsx(Type):
     """
-    kind = type(obj)
-    print kind
-    if kind is str:
-        try:
-            open(obj)
-        except Exception:
-            kind = "str_like"
-    if hasattr(obj, "read"):
-        kind = "file_like"
-    print kind
-    adapt_map = {
-        bytearray: signature,
-        bytes: signature,
-        str: get_sig_by_path,
-        "str_like": get_sig_by_str_like,
-        "file_like": get_sig_by_file_like,
-        memoryview: lambda x: signature(x).tolist(),
-    }
-    default = lambda xz: TypeError('Unsupported type as file input: %s' % kind)
-    return adapt_map.get(kind, default)(obj)
+    Implements the XLSX document type matcher.
+    Only detected by deep inspection, see `guess_deep()`.
+    """
+    __slots__ = ()
+    MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    EXTENSION = 'xlsx'
+    CODE = 59
+
+    def __init__(self):
+        super(Xlsx, self).__init__(
+            mime=Xlsx.MIME,
+            extension=Xlsx.EXTENSION
+        )
 
 
-def match(obj, matchers=TYPES):
+class Pptx(Type):
     """
-    Matches the given input againts the available
-    file type matchers.
+    Implements the PPTX document type matcher.
+    Only detected by deep inspection, see `guess_deep()`.
+    """
+    __slots__ = ()
+    MIME = ('application/vnd.openxmlformats-officedocument.'
+            'presentationml.presentation')
+    EXTENSION = 'pptx'
+    CODE = 60
 
-    Args:
-        obj: path to file, bytes or bytearray.
+    def __init__(self):
+        super(Pptx, self).__init__(
+            mime=Pptx.MIME,
+            extension=Pptx.EXTENSION
+        )
 
-    Returns:
-        Type instance if type matches. Otherwise None.
 
-    Raises:
-        TypeError: if obj is not a supported type.
+class Odt(Type):
     """
-    buf = get_bytes(obj)
-
-    for matcher in matchers:
-        if matcher.match(buf):
-            return matcher
+    Implements the ODT document type matcher.
+    Only detected by deep inspection, see `guess_deep()`.
+    """
+    __slots__ = ()
+    MIME = 'application/vnd.oasis.opendocument.text'
+    EXTENSION = 'odt'
+    CODE = 61
 
-    return None
+    def __init__(self):
+        super(Odt, self).__init__(
+            mime=Odt.MIME,
+            extension=Odt.EXTENSION
+        )
 
 
-def is_extension_supported(ext):
+class Ods(Type):
     """
-    Checks if the given extension string is
-    one of the supported by the file matchers.
+    Implements the ODS document type matcher.
+    Only detected by deep inspection, see `guess_deep()`.
+    """
+    __slots__ = ()
+    MIME = 'application/vnd.oasis.opendocument.spreadsheet'
+    EXTENSION = 'ods'
+    CODE = 62
 
-    Args:
-        ext (str): file extension string. E.g: jpg, png, mp4, mp3
+    def __init__(self):
+        super(Ods, self).__init__(
+            mime=Ods.MIME,
+            extension=Ods.EXTENSION
+        )
 
-    Returns:
-        True if the file extension is supported.
-        Otherwise False.
+
+class Odp(Type):
     """
-    for kind in TYPES:
-        if kind.extension is ext:
-            return True
-    return False
+    Implements the ODP document type matcher.
+    Only detected by deep inspection, see `guess_deep()`.
+    """
+    __slots__ = ()
+    MIME = 'application/vnd.oasis.opendocument.presentation'
+    EXTENSION = 'odp'
+    CODE = 63
 
+    def __init__(self):
+        super(Odp, self).__init__(
+            mime=Odp.MIME,
+            extension=Odp.EXTENSION
+        )
 
-def guess(obj):
-    """
-    Infers the type of the given input.
 
-    Function is overloaded to accept multiple types in input
-    and peform the needed type inference based on it.
+# registry
 
-    Args:
-        obj: path to file, bytes or bytearray.
+def _normalize_extension(ext):
+    # None and other non-str values become None, which no type uses.
+    if not isinstance(ext, str):
+        return None
+    return ext.lstrip('.').lower()
 
-    Returns:
-        The matched type instance. Otherwise None.
 
-    Raises:
-        TypeError: if obj is not a supported type.
-    """
-    return match(obj) if obj else None
+def _normalize_mime(mime):
+    # Drops Content-Type parameters, e.g. "; charset=binary".
+    if not isinstance(mime, str):
+        return None
+    return mime.split(';', 1)[0].strip().lower()
 
 
-def guess_mime(obj):
+def _refinements(kinds):
+    """
+    Returns a mapping of each of the given types to the set of the
+    other ones refining it, i.e. having a signature implying one of
+    its own, e.g. Epub for Zip, see `Signature.implies()`.
+    """
+    declarative = [kind for kind in kinds
+                   if type(kind).match is Type.match and kind.SIGNATURES]
+    # Signatures by their first fixed (position, byte), which another
+    # signature must have fixed as well to imply them.
+    bases = {}
+    unkeyed = []
+    for kind in declarative:
+        for base in kind.SIGNATURES:
+            for offset, pattern, mask in base.runs:
+                if pattern and mask is None:
+                    bases.setdefault((offset, pattern[0]), []).append(
+                        (kind, base))
+                    break
+            else:
+                unkeyed.append((kind, base))
+
+    before = {kind: set() for kind in kinds}
+    for other in declarative:
+        for sig in other.SIGNATURES:
+            found = list(unkeyed)
+            for offset, pattern, mask in sig.runs:
+                for i, byte in enumerate(pattern):
+                    if mask is None or mask[i] == 0xFF:
+                        found.extend(bases.get((offset + i, byte), ()))
+            for kind, base in found:
+                if kind is not other and sig.implies(base):
+                    before[kind].add(other)
+    return before
+
+
+def _specific_first(kinds, before):
+    """
+    Returns the given types in the same order, except that every type
+    is moved ahead of the types it refines, see `_refinements()`.
+    Types refining each other keep their order.
+    """
+    members = set(kinds)
+    placed = set()
+    ordered = []
+    pending = list(kinds)
+    while pending:
+        index = next((index for index, kind in enumerate(pending)
+                      if placed.issuperset(before[kind] & members)), 0)
+        kind = pending.pop(index)
+        placed.add(kind)
+        ordered.append(kind)
+    return ordered
+
+
+class _RegistryState(object):
+    """
+    Lookup structures derived from a registry snapshot,
+    rebuilt lazily whenever the registry changes.
     """
-    Infers the file type of the given input
-    and returns its MIME type.
 
-    Args:
-        obj: path to file, bytes or bytearray.
+    def __init__(self, version, kinds, refined_by=None):
+        self.version = version
+        self.kinds = kinds
+        self.positions = {kind: position
+                          for position, kind in enumerate(kinds)}
+        self._table = None
+        self._dispatch = None
+        self._unindexed = None
+        self._refined_by = refined_by
+        self._sizes = None
+        self._extensions = None
+        self._mimes = None
+        self.header_size = max([kind.header_size for kind in kinds] or [0])
+        self.probe_size = min(self.header_size, DEFAULT_HEADER_SIZE)
 
-    Returns:
-        The matched MIME type as string. Otherwise None.
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = compile_matchers(self.kinds)
+        return self._table
 
-    Raises:
-        TypeError: if obj is not a supported type.
-    """
-    kind = guess(obj)
-    return kind.mime if kind else kind
+    @property
+    def dispatch(self):
+        if self._dispatch is None:
+            self._dispatch = _Dispatch(self.table)
+        return self._dispatch
 
+    @property
+    def refined_by(self):
+        if self._refined_by is None:
+            self._refined_by = _refinements(self.kinds)
+        return self._refined_by
 
-def guess_extension(obj):
-    """
-    Infers the file type of the given input
-    and returns its RFC file extension.
+    @property
+    def unindexed(self):
+        # (matcher, check) pairs of all matchers, for empty buffers.
+        if self._unindexed is None:
+            self._unindexed = tuple((kind, _check(kind))
+                                    for kind in self.kinds)
+        return self._unindexed
 
-    Args:
-        obj: path to file, bytes or bytearray.
+    @property
+    def sizes(self):
+        # Header size needed by the candidates of each leading byte.
+        if self._sizes is None:
+            self._sizes = tuple(max([kind.header_size for kind in kinds] or
+                                    [0])
+                                for kinds in self.table)
+        return self._sizes
+
+    def extension(self, buf):
+        """
+        Returns the size a header read with `probe_size` bytes must be
+        extended to for its candidates to be decided, 0 if complete.
+        """
+        if (self.header_size > self.probe_size and buf and
+                len(buf) >= self.probe_size):
+            size = self.sizes[buf[0]]
+            if size > len(buf):
+                return size
+        return 0
+
+    @property
+    def extensions(self):
+        if self._extensions is None:
+            index = {}
+            for kind in self.kinds:
+                for ext in kind.extensions:
+                    index.setdefault(_normalize_extension(ext),
+                                     []).append(kind)
+            self._extensions = {key: tuple(kinds)
+                                for key, kinds in index.items()}
+        return self._extensions
+
+    @property
+    def mimes(self):
+        if self._mimes is None:
+            index = {}
+            for kind in self.kinds:
+                index.setdefault(_normalize_mime(kind.mime), []).append(kind)
+            self._mimes = {key: tuple(kinds) for key, kinds in index.items()}
+        return self._mimes
+
+
+class Registry(object):
+    """
+    Ordered collection of file type matchers.
+
+    Matchers are kept sorted by priority (highest first), then by
+    registration order, the latest `add()` first, except that a type
+    whose signature implies the signature of another type of the same
+    priority is tried before it, so that overlapping types such as
+    Epub and Zip resolve the same way whatever the order they were
+    added in.
+
+    The dispatch table and the extension and MIME indexes are
+    derived from the registry and rebuilt on first use after a change.
+
+    Every registered matcher has a small integer type code, see
+    `code()`, so that results can be stored compactly, see `TypeArray`.
+
+    Args:
+        kinds: Type instances to register with the default priority.
+        loader: optional callable returning (Type instance, category)
+            pairs, only called when the registry is first used, so
+            that creating it costs nothing until then.
+    """
+
+    def __init__(self, kinds=(), loader=None, _parent=None, _category=None):
+        self._parent = _parent
+        self._category = _category
+        self._entries = []
+        self._seq = 0
+        self._added = 0
+        self._version = 0
+        self._state_cache = None
+        self._views = {}
+        self._codes = {}
+        self._by_code = {}
+        self._retired = {}
+        self._next_code = FIRST_CUSTOM_CODE
+        self._loader = loader
+        if loader is not None:
+            # _thread is built in, whereas importing threading would
+            # more than double the import time of this module.
+            import _thread
+            self._load_lock = _thread.allocate_lock()
+        for kind in kinds:
+            if not isinstance(kind, Type):
+                raise TypeError('instance must inherit from '
+                                'filetype.types.Type')
+            self._entries.append([kind, 0, self._seq, _category])
+            self._seq += 1
+            self._assign_code(kind)
+
+    @property
+    def _root(self):
+        return self._parent if self._parent is not None else self
+
+    def _load(self):
+        # Registers the loader types, once, before any other access.
+        with self._load_lock:
+            if self._loader is None:
+                return
+            for kind, category in self._loader():
+                self._entries.append([kind, 0, self._seq, category])
+                self._seq += 1
+                self._assign_code(kind)
+            self._version += 1
+            self._loader = None
+
+    def _assign_code(self, kind, code=None):
+        # Gives the matcher its declared CODE, or the next free code
+        # from FIRST_CUSTOM_CODE if it has none or it is taken. Codes
+        # of removed matchers are only given back to a matcher
+        # declaring them, so that stored codes keep their meaning.
+        if kind in self._codes:
+            return
+        if code is None:
+            code = kind.CODE
+        if code is None or code in self._by_code:
+            code = self._next_code
+            while code in self._by_code or code in self._retired:
+                code += 1
+            if code > 0xFFFF:
+                raise OverflowError('no type code left')
+            self._next_code = code + 1
+        self._retired.pop(code, None)
+        self._codes[kind] = code
+        self._by_code[code] = kind
+
+    def _retire_code(self, kind):
+        code = self._codes.pop(kind)
+        del self._by_code[code]
+        self._retired[code] = kind
+        return code
+
+    def _kinds_by_code(self):
+        # Live and retired codes, to read stored codes back.
+        kinds = dict(self._retired)
+        kinds.update(self._by_code)
+        return kinds
+
+    def _loaded_root(self):
+        root = self._root
+        if root._loader is not None:
+            root._load()
+        return root
+
+    def _state(self):
+        root = self._loaded_root()
+        state = self._state_cache
+        if state is None or state.version != root._version:
+            from itertools import groupby
+
+            entries = [entry for entry in root._entries
+                       if self._category is None or
+                       entry[3] == self._category]
+            entries.sort(key=lambda entry: (-entry[1], entry[2]))
+            before = _refinements([entry[0] for entry in entries])
+            kinds = []
+            for _, group in groupby(entries, key=lambda entry: entry[1]):
+                kinds.extend(_specific_first([entry[0] for entry in group],
+                                             before))
+            state = self._state_cache = _RegistryState(
+                root._version, tuple(kinds), before)
+        return state
+
+    def __iter__(self):
+        return iter(self._state().kinds)
+
+    def __len__(self):
+        return len(self._state().kinds)
+
+    def __getitem__(self, index):
+        return self._state().kinds[index]
+
+    def __contains__(self, kind):
+        return kind in self._state().positions
+
+    def __repr__(self):
+        return 'Registry(%s)' % ', '.join(type(kind).__name__ for kind in self)
+
+    def add(self, kind, priority=0, category=None):
+        """
+        Registers a new type matcher.
+
+        Among matchers of the same priority, the most recently added
+        one is tried first, ahead of the ones given to the constructor.
+
+        Args:
+            kind: Type inherited instance.
+            priority: matchers with a higher priority are tried first.
+            category: category name, e.g. image. Defaults to the
+                category of this registry when it is a category view.
+
+        Raises:
+            TypeError: if kind is not a Type instance.
+        """
+        if not isinstance(kind, Type):
+            raise TypeError('instance must inherit from filetype.types.Type')
+        root = self._loaded_root()
+        root._added -= 1
+        root._entries.append([kind, priority, root._added,
+                              category or self._category])
+        root._version += 1
+        root._assign_code(kind)
+
+    def remove(self, kind):
+        """
+        Unregisters a type matcher.
+
+        Args:
+            kind: Type instance, or Type subclass to remove all
+                of its instances.
+
+        Raises:
+            ValueError: if no such matcher is registered.
+        """
+        root = self._loaded_root()
+        kept = [entry for entry in root._entries
+                if not (entry[0] is kind or
+                        isinstance(kind, type) and isinstance(entry[0], kind))]
+        if len(kept) == len(root._entries):
+            raise ValueError('%r is not registered' % (kind,))
+        root._entries[:] = kept
+        root._version += 1
+        remaining = set(entry[0] for entry in kept)
+        for removed in [other for other in root._codes
+                        if other not in remaining]:
+            root._retire_code(removed)
+
+    def replace(self, old, new):
+        """
+        Replaces a registered type matcher, keeping its priority,
+        category and registration order, and its type code unless
+        new declares its own.
+
+        Raises:
+            ValueError: if old is not registered.
+            TypeError: if new is not a Type instance.
+        """
+        if not isinstance(new, Type):
+            raise TypeError('instance must inherit from filetype.types.Type')
+        root = self._loaded_root()
+        for entry in root._entries:
+            if entry[0] is old:
+                entry[0] = new
+                root._version += 1
+                if not any(other[0] is old for other in root._entries):
+                    code = root._retire_code(old)
+                    root._assign_code(new, code if new.CODE is None else None)
+                return
+        raise ValueError('%r is not registered' % (old,))
+
+    def category(self, name):
+        """
+        Returns the live sub-registry of the given category.
+        Types added through it are registered in that category.
+        """
+        root = self._root
+        view = root._views.get(name)
+        if view is None:
+            view = root._views[name] = Registry(_parent=root, _category=name)
+        return view
+
+    def categories(self):
+        """
+        Returns the names of the registered categories.
+        """
+        names = []
+        for entry in self._loaded_root()._entries:
+            if entry[3] is not None and entry[3] not in names:
+                names.append(entry[3])
+        return names
+
+    def position(self, kind):
+        """
+        Returns the position of the given matcher, None if missing.
+        """
+        return self._state().positions.get(kind)
+
+    def by_extension(self, ext):
+        """
+        Returns the matchers using the given file extension, in order.
+        """
+        return self._state().extensions.get(_normalize_extension(ext), ())
+
+    def by_mime(self, mime):
+        """
+        Returns the matchers using the given MIME type, in order.
+        """
+        return self._state().mimes.get(_normalize_mime(mime), ())
+
+    def code(self, kind):
+        """
+        Returns the type code of the given matcher.
+
+        Built-in types have fixed codes, their `CODE`, which never
+        change across versions. Other matchers get theirs on
+        registration, from FIRST_CUSTOM_CODE on. Codes fit in an
+        unsigned short, 0 is never used and stands for no match.
+
+        Raises:
+            ValueError: if kind is not registered.
+        """
+        try:
+            return self._loaded_root()._codes[kind]
+        except KeyError:
+            raise ValueError('%r is not registered' % (kind,))
+
+    def by_code(self, code):
+        """
+        Returns the matcher of the given type code, None if missing.
+
+        The codes of removed matchers still resolve to them, and are
+        never given to other matchers, so that stored results remain
+        readable.
+        """
+        root = self._loaded_root()
+        kind = root._by_code.get(code)
+        return kind if kind is not None else root._retired.get(code)
+
+    @property
+    def table(self):
+        """
+        First-byte dispatch table, see `compile_matchers()`.
+        """
+        return self._state().table
+
+    @property
+    def header_size(self):
+        """
+        Number of header bytes needed to decide every matcher, i.e.
+        the largest `Type.header_size`. Registries of short signatures,
+        such as the image category, read less of each input.
+        """
+        return self._state().header_size
+
+
+def _builtin_types():
+    for category, kinds in (
+            ('image', (Jpeg, Png, Gif, Webp, Cr2, Tiff, Bmp, Jxr, Psd, Ico)),
+            ('video', (Mp4, M4v, Mkv, Webm, Mov, Avi, Wmv, Flv, Mpeg)),
+            ('audio', (Midi, Mp3, M4a, Ogg, Flac, Wav, Amr)),
+            ('font', (Woff, Woff2, Ttf, Otf)),
+            ('archive', (Epub, Zip, Tar, Rar, Gz, Bz2, SevenZ, Pdf, Exe, Swf,
+                         Rtf, Nes, Crx, Cab, Eot, Ps, Xz, Sqlite, Deb, Ar, Z,
+                         Lz, Jar, Apk)),
+            ('document', (Doc, Xls, Ppt, Docx, Xlsx, Pptx, Odt, Ods, Odp))):
+        for kind in kinds:
+            yield kind(), category
+
+
+# The built-in types are instantiated on first detection only.
+TYPES = Registry(loader=_builtin_types)
+
+
+# instrumentation
+
+_STATS = None
+
+
+class Stats(object):
+    """
+    Opt-in instrumentation of the detection hot path.
+
+    Disabled by default, leaving a single global lookup on the hot
+    path. Once enabled with `STATS.enable()`, it counts:
+
+    - per matcher: invocations, matches and cumulative time.
+    - per input kind (path, bytes, file-like, memoryview): header
+      reads, bytes read and cumulative time.
+    - per detected type: number of results, None for no match.
+
+    While enabled, `guess_many()` and `match_codes()` match inputs
+    one by one so that they are counted too. The NumPy engine of
+    `match_codes()` only counts reads, and process pool workers
+    are not counted.
+
+    A tracer, if given, is called for every event as
+    ``tracer(event, subject, value, ns)``:
+
+    - ('read', input kind, bytes read, ns)
+    - ('match', Type instance, matched, ns)
+    - ('result', Type instance or None, matchers run, ns)
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.tracer = None
+        self._lock = None
+        self._clock = None
+        self._matchers = {}
+        self._reads = {}
+        self._results = {}
+
+    def enable(self, tracer=None):
+        """
+        Starts collecting, keeping the counters collected so far.
+
+        Args:
+            tracer: optional callable receiving every event.
+        """
+        global _STATS
+        import threading
+        from time import perf_counter_ns
+
+        if self._lock is None:
+            self._lock = threading.Lock()
+        self._clock = perf_counter_ns
+        self.tracer = tracer
+        self.enabled = True
+        _STATS = self
+
+    def disable(self):
+        """
+        Stops collecting, keeping the counters collected so far.
+        """
+        global _STATS
+        self.enabled = False
+        _STATS = None
+
+    def reset(self):
+        """
+        Drops every counter.
+        """
+        if self._lock is None:
+            self._matchers, self._reads, self._results = {}, {}, {}
+            return
+        with self._lock:
+            self._matchers, self._reads, self._results = {}, {}, {}
+
+    def snapshot(self, reset=False):
+        """
+        Returns the counters as plain dicts, keyed by extension for
+        matchers and results, and by input kind for reads:
+
+            {'matchers': {'png': {'calls': 10, 'hits': 4, 'ns': 5120}},
+             'reads': {'path': {'count': 4, 'bytes': 1048, 'ns': 98000}},
+             'results': {'png': 4, None: 2}}
+
+        Args:
+            reset: drop the counters once copied, so that successive
+                snapshots hold the deltas.
+        """
+        if self._lock is None:
+            return {'matchers': {}, 'reads': {}, 'results': {}}
+        with self._lock:
+            matchers, reads, results = (self._matchers, self._reads,
+                                        self._results)
+            if reset:
+                self._matchers, self._reads, self._results = {}, {}, {}
+            else:
+                matchers, reads, results = (dict(matchers), dict(reads),
+                                            dict(results))
+
+        snapshot = {'matchers': {}, 'reads': {}, 'results': {}}
+        for kind, (calls, hits, ns) in matchers.items():
+            entry = snapshot['matchers'].setdefault(
+                kind.extension, {'calls': 0, 'hits': 0, 'ns': 0})
+            entry['calls'] += calls
+            entry['hits'] += hits
+            entry['ns'] += ns
+        for source, (count, size, ns) in reads.items():
+            snapshot['reads'][source] = {'count': count, 'bytes': size,
+                                         'ns': ns}
+        for kind, count in results.items():
+            key = kind.extension if kind is not None else None
+            snapshot['results'][key] = snapshot['results'].get(key, 0) + count
+        return snapshot
+
+    def _read(self, source, size, ns):
+        with self._lock:
+            entry = self._reads.get(source)
+            if entry is None:
+                entry = self._reads[source] = [0, 0, 0]
+            entry[0] += 1
+            entry[1] += size
+            entry[2] += ns
+        if self.tracer is not None:
+            self.tracer('read', source, size, ns)
+
+    def _match(self, buf, candidates):
+        clock = self._clock
+        tracer = self.tracer
+        result = None
+        runs = []
+        start = clock()
+        for matcher, check in candidates:
+            before = clock()
+            matched = check(buf)
+            elapsed = clock() - before
+            runs.append((matcher, matched, elapsed))
+            if tracer is not None:
+                tracer('match', matcher, matched, elapsed)
+            if matched:
+                result = matcher
+                break
+        total = clock() - start
+
+        with self._lock:
+            for matcher, matched, elapsed in runs:
+                entry = self._matchers.get(matcher)
+                if entry is None:
+                    entry = self._matchers[matcher] = [0, 0, 0]
+                entry[0] += 1
+                entry[1] += bool(matched)
+                entry[2] += elapsed
+            self._results[result] = self._results.get(result, 0) + 1
+        if tracer is not None:
+            tracer('result', result, len(runs), total)
+        return result
+
+
+STATS = Stats()
+
+
+# utils
+
+def _read_fp(fp, size):
+    # Unbuffered, so that exactly one read of the header size is
+    # issued and no intermediate bytes object is allocated.
+    buf = bytearray(size)
+    del buf[fp.readinto(buf):]
+    return buf
+
+
+def get_sig_by_path(path, size=DEFAULT_HEADER_SIZE):
+    with open(path, 'rb', buffering=0) as fp:
+        return _read_fp(fp, size)
+
+
+def get_sig_by_file_like(file_obj, size=DEFAULT_HEADER_SIZE):
+    byte = file_obj.read(size)
+    if byte:
+        return byte
+    elif hasattr(file_obj, 'getvalue'):
+        return file_obj.getvalue()[:size]
+
+
+def get_sig_by_buffer(obj, size=DEFAULT_HEADER_SIZE):
+    """
+    Returns a zero-copy view over the given buffer, such as a
+    memoryview or an mmap. Memory maps are exposed whole, so that
+    matchers may look beyond the first `size` bytes at no extra cost.
+    """
+    view = memoryview(obj)
+    if view.format != 'B' or view.ndim != 1:
+        if not view.c_contiguous:
+            return view.tobytes()[:size]
+        view = view.cast('B')
+    return view if _is_mmap(obj) else view[:size]
+
+
+def get_sig_by_str_like(str_obj, size=DEFAULT_HEADER_SIZE):
+    if isinstance(str_obj, str):
+        return bytearray(str_obj[:size], 'utf-8')[:size]
+    return bytearray(str_obj)[:size]
+
+
+def _get_sig_by_str(str_obj, size=DEFAULT_HEADER_SIZE):
+    # A string naming a readable file is read as a path, anything
+    # else is taken as the content itself. Trying the real read
+    # avoids a separate existence check and a second open().
+    try:
+        return get_sig_by_path(str_obj, size)
+    except (OSError, ValueError):
+        return get_sig_by_str_like(str_obj, size)
+
+
+def signature(array, size=DEFAULT_HEADER_SIZE):
+    """
+    Returns the first bytes of the given bytearray
+    as part of the file header signature.
+
+    Args:
+        array: bytearray to extract the header signature.
+        size: number of bytes to extract, 262 by default.
+
+    Returns:
+        First `size` bytes of the file content as bytearray type.
+    """
+    length = len(array)
+    index = size if length > size else length
+
+    return array[:index]
+
+
+_ADAPTERS = {
+    bytearray: signature,
+    bytes: signature,
+    str: _get_sig_by_str,
+    memoryview: get_sig_by_buffer,
+}
+
+
+def _is_mmap(obj):
+    # mmap is only imported when memory maps are used, no object can
+    # be one before some code imported it.
+    mmap = sys.modules.get('mmap')
+    return mmap is not None and isinstance(obj, mmap.mmap)
+
+
+def get_bytes(obj, size=DEFAULT_HEADER_SIZE):
+    """
+    Infers the input type and reads the first `size` bytes,
+    returning a sliced bytearray.
+
+    memoryview and mmap inputs are not copied, a memoryview
+    over them is returned instead, see `get_sig_by_buffer()`.
+
+    Args:
+        obj: path to file, bytes, bytearray, memoryview or mmap.
+        size: number of header bytes to read, 262 by default.
+
+    Returns:
+        First `size` bytes of the file content as bytearray type.
+
+    Raises:
+        TypeError: if obj is not a supported type.
+    """
+    adapter = _ADAPTERS.get(type(obj))
+    if adapter is not None:
+        return adapter(obj, size)
+    if _is_mmap(obj):
+        _ADAPTERS[type(obj)] = get_sig_by_buffer
+        return get_sig_by_buffer(obj, size)
+    if hasattr(obj, "read"):
+        return get_sig_by_file_like(obj, size)
+    if isinstance(obj, os.PathLike):
+        return get_sig_by_path(obj, size)
+    raise TypeError('Unsupported type as file input: %s' % type(obj))
+
+
+def _get_header(obj, matchers, read=get_bytes):
+    """
+    Reads as much of the header of the given input as the given
+    matchers need.
+
+    A first read of the registry wide `probe_size` is made, which is
+    all there is to read unless a matcher declares a header larger
+    than DEFAULT_HEADER_SIZE. The header is then only extended when
+    a candidate for its leading byte needs more.
+    """
+    stats = _STATS
+    if stats is not None:
+        start = stats._clock()
+    state = _compiled(matchers)
+    if read is get_sig_by_path or read is get_bytes and (
+            type(obj) is str or isinstance(obj, os.PathLike)):
+        buf = _read_path_header(obj, state,
+                                read is get_bytes and type(obj) is str)
+    else:
+        buf = read(obj, state.probe_size)
+        size = state.extension(buf)
+        if size:
+            if hasattr(obj, 'read') and not _is_mmap(obj):
+                # Streams cannot be read again, carry on reading instead.
+                buf = bytes(buf) + _read_header(obj, size - len(buf))
+            else:
+                buf = read(obj, size)
+    if stats is not None:
+        stats._read(_source(obj, read), len(buf) if buf else 0,
+                    stats._clock() - start)
+    return buf
+
+
+def _read_path_header(path, state, content=False):
+    """
+    Reads the header of the file at the given path, extending it on
+    the same handle when the candidates of its leading byte need more.
+    With content=True, a string not naming a readable file is taken
+    as the content itself, see `_get_sig_by_str()`.
+    """
+    try:
+        fp = open(path, 'rb', buffering=0)
+    except (OSError, ValueError):
+        if not content:
+            raise
+        buf = get_sig_by_str_like(path, state.probe_size)
+        size = state.extension(buf)
+        return get_sig_by_str_like(path, size) if size else buf
+    with fp:
+        buf = _read_fp(fp, state.probe_size)
+        size = state.extension(buf)
+        if size:
+            buf += _read_header(fp, size - len(buf))
+        return buf
+
+
+def _source(obj, read):
+    # Input kind of the given header read, as counted by Stats.
+    kind = type(obj)
+    if read is get_sig_by_path or read is _read_fp:
+        return 'path'
+    if kind is bytes or kind is bytearray:
+        return 'bytes'
+    if kind is memoryview or _is_mmap(obj):
+        return 'memoryview'
+    if kind is str or isinstance(obj, os.PathLike):
+        return 'path'
+    return 'file-like'
+
+
+# dispatch
+
+_ALL_BYTES = frozenset(range(256))
+
+
+def _leading_bytes(matcher):
+    """
+    Returns the set of first byte values the given matcher may accept.
+
+    Declarative matchers are indexed from their signatures. Matchers
+    overriding `match()`, and signatures not anchored at offset 0
+    (e.g. Tar, Webp), end up in every bucket.
+    """
+    if type(matcher).match is not Type.match:
+        return _ALL_BYTES
+    firsts = set()
+    for sig in matcher.SIGNATURES:
+        firsts.update(sig.leading_bytes())
+    return frozenset(firsts)
+
+
+def _check(matcher):
+    """
+    Returns the function matching a buffer against the given matcher.
+
+    `match()` overrides may rely on bytearray methods, e.g. startswith,
+    so they are given the header as bytes when the buffer is a
+    memoryview, as for memoryview and mmap inputs.
+    """
+    match = matcher.match
+    if type(matcher).match is Type.match:
+        return match
+    size = matcher.header_size
+
+    def check(buf):
+        if type(buf) is memoryview:
+            buf = buf[:size].tobytes()
+        return match(buf)
+    return check
+
+
+def _bucket_checks(matcher):
+    """
+    Returns a mapping of leading byte values to the function checking
+    the signatures of the given matcher that accept that byte, e.g.
+    only the PK\x03\x04 one of Zip for a leading P, or its `match()`
+    for matchers overriding it.
+    """
+    if type(matcher).match is not Type.match:
+        return dict.fromkeys(_ALL_BYTES, _check(matcher))
+    signatures = matcher.SIGNATURES
+    if not signatures:
+        return {}
+    firsts = [sig.leading_bytes() for sig in signatures]
+    check = _CHECKS.get(type(matcher))
+    if check is None:
+        check = _CHECKS[type(matcher)] = _compile_check(signatures)
+    # Signatures not anchored at offset 0, e.g. the one of Tar, are
+    # the only candidates outside the bytes of the anchored ones.
+    anchored = frozenset().union(*[accepted for accepted in firsts
+                                   if accepted != _ALL_BYTES])
+    if not anchored:
+        return dict.fromkeys(_ALL_BYTES, check)
+    floating = tuple(sig for sig, accepted in zip(signatures, firsts)
+                     if accepted == _ALL_BYTES)
+    result = {}
+    if floating:
+        result = dict.fromkeys(_ALL_BYTES - anchored,
+                               _compile_check(floating))
+    checks = {}
+    for byte in anchored:
+        key = tuple(sig for sig, accepted in zip(signatures, firsts)
+                    if byte in accepted)
+        if key not in checks:
+            checks[key] = (check if len(key) == len(signatures) else
+                           _compile_check(key))
+        result[byte] = checks[key]
+    return result
+
+
+class _Dispatch(dict):
+    """
+    Candidates of each leading byte as (matcher, check) pairs, see
+    `_bucket_checks()`, built on the first lookup of each byte.
+    """
+    __slots__ = ('table', 'checks')
+
+    def __init__(self, table):
+        self.table = table
+        self.checks = {}
+
+    def __missing__(self, byte):
+        bucket = []
+        for kind in self.table[byte]:
+            checks = self.checks.get(kind)
+            if checks is None:
+                checks = self.checks[kind] = _bucket_checks(kind)
+            bucket.append((kind, checks[byte]))
+        bucket = self[byte] = tuple(bucket)
+        return bucket
+
+
+def compile_matchers(matchers):
+    """
+    Builds a first-byte dispatch table for the given matchers.
+
+    Args:
+        matchers: iterable of Type instances, in priority order.
+
+    Returns:
+        Tuple of 256 tuples, the candidate matchers for each
+        leading byte value in their original order.
+    """
+    buckets = [[] for _ in range(256)]
+    for matcher in matchers:
+        for byte in _leading_bytes(matcher):
+            buckets[byte].append(matcher)
+    return tuple(tuple(bucket) for bucket in buckets)
+
+
+_DISPATCH_CACHE = {}
+
+
+def _compiled(matchers):
+    # Derived lookup structures of the given matchers, the registry
+    # ones for a Registry, cached ones for plain sequences.
+    if isinstance(matchers, Registry):
+        return matchers._state()
+    key = tuple(matchers)
+    state = _DISPATCH_CACHE.get(key)
+    if state is None:
+        if len(_DISPATCH_CACHE) >= 32:
+            _DISPATCH_CACHE.clear()
+        state = _DISPATCH_CACHE[key] = _RegistryState(None, key)
+    return state
+
+
+def _dispatch_table(matchers):
+    return _compiled(matchers).table
+
+
+def _candidates(buf, matchers):
+    # (matcher, check) pairs to try on the given buffer, in order.
+    state = _compiled(matchers)
+    return state.dispatch[buf[0]] if buf else state.unindexed
+
+
+def match(obj, matchers=TYPES):
+    """
+    Matches the given input againts the available
+    file type matchers.
+
+    Only the matchers able to accept the leading byte of the
+    input are evaluated, see `compile_matchers()`, and only as many
+    header bytes as they need are read, see `Registry.header_size`.
+
+    Args:
+        obj: path to file, bytes or bytearray.
+
+    Returns:
+        Type instance if type matches. Otherwise None.
+
+    Raises:
+        TypeError: if obj is not a supported type.
+    """
+    return _match_buffer(_get_header(obj, matchers), matchers)
+
+
+def _match_buffer(buf, matchers):
+    candidates = _candidates(buf, matchers)
+    stats = _STATS
+    if stats is not None:
+        return stats._match(buf, candidates)
+    for matcher, check in candidates:
+        if check(buf):
+            return matcher
+
+    return None
+
+
+def is_extension_supported(ext):
+    """
+    Checks if the given extension string is
+    one of the supported by the file matchers.
+
+    Args:
+        ext (str): file extension string. E.g: jpg, png, mp4, mp3
+
+    Returns:
+        True if the file extension is supported.
+        Otherwise False.
+    """
+    return bool(TYPES.by_extension(ext))
+
+
+def is_mime_supported(mime):
+    """
+    Checks if the given MIME type is
+    one of the supported by the file matchers.
+
+    Args:
+        mime (str): MIME string. E.g: image/jpeg, video/mpeg
+
+    Returns:
+        True if the MIME type is supported.
+        Otherwise False.
+    """
+    return bool(TYPES.by_mime(mime))
+
+
+def guess(obj):
+    """
+    Infers the type of the given input.
+
+    Function is overloaded to accept multiple types in input
+    and peform the needed type inference based on it.
+
+    Args:
+        obj: path to file, bytes or bytearray.
+
+    Returns:
+        The matched type instance. Otherwise None.
+
+    Raises:
+        TypeError: if obj is not a supported type.
+    """
+    return match(obj) if obj else None
+
+
+def guess_path(path, use_mmap=False, cache=None, fallback=None):
+    """
+    Infers the type of the file at the given path.
+
+    Unlike `guess()`, the input is always read as a path and
+    never falls back to being matched as raw content.
+
+    Args:
+        path: path to file, as str, bytes or path-like object.
+        use_mmap: memory-map the file instead of reading its header.
+            Matchers then see the whole file without further reads.
+        cache: optional PathCache, unchanged files are then
+            answered from it without being read.
+        fallback: optional FileFallback asked about the files
+            no matcher recognises.
+
+    Returns:
+        The matched type instance. Otherwise None.
+
+    Raises:
+        OSError: if the file cannot be read.
+    """
+    if cache is not None:
+        kind = cache.guess(path)
+    elif use_mmap:
+        kind = _match_mapped(path, TYPES)
+    else:
+        kind = _match_buffer(_get_header(path, TYPES, get_sig_by_path), TYPES)
+    if kind is None and fallback is not None:
+        return fallback.guess(path)
+    return kind
+
+
+def _match_mapped(path, matchers):
+    import mmap
+
+    with open(path, 'rb', buffering=0) as fp:
+        try:
+            mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Empty files and special files cannot be mapped.
+            return _match_buffer(_get_header(fp, matchers, _read_fp),
+                                 matchers)
+
+    with mapping:
+        view = memoryview(mapping)
+        try:
+            return _match_buffer(view, matchers)
+        finally:
+            view.release()
+
+
+def guess_bytes(buf):
+    """
+    Infers the type of the given in-memory content.
+
+    Args:
+        buf: bytes, bytearray, memoryview or mmap holding the content.
+
+    Returns:
+        The matched type instance. Otherwise None.
+    """
+    if isinstance(buf, memoryview) or _is_mmap(buf):
+        return _match_buffer(_get_header(buf, TYPES, get_sig_by_buffer),
+                             TYPES)
+    return _match_buffer(_get_header(buf, TYPES, signature), TYPES)
+
+
+# cache
+
+class PathCache(object):
+    """
+    Least recently used cache of path classification results.
+
+    Entries are keyed by file identity and version, i.e.
+    (st_dev, st_ino, st_mtime_ns, st_size), so that a lookup only
+    costs a stat call while the file is unchanged, renamed or
+    reached through another hard link. Safe to share between threads.
+
+    Results depend on the matchers the cache was created with,
+    call `clear()` after changing them.
+
+    Args:
+        maxsize: maximum number of entries, the least recently
+            used one is evicted first. Unbounded if None.
+        matchers: Type instances to match against, in priority order.
+    """
+
+    def __init__(self, maxsize=65536, matchers=TYPES):
+        import threading
+        from collections import OrderedDict
+
+        self.maxsize = maxsize
+        self.matchers = matchers
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(st):
+        return st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size
+
+    def guess(self, path):
+        """
+        Infers the type of the file at the given path, reading it
+        only when it is not cached or changed since it was cached.
+
+        Args:
+            path: path to file, as str, bytes or path-like object.
+
+        Returns:
+            The matched type instance. Otherwise None.
+
+        Raises:
+            OSError: if the file cannot be read.
+        """
+        key = self._key(os.stat(path))
+        with self._lock:
+            try:
+                kind = self._entries[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return kind
+
+        # Key the result by the identity of the file actually read,
+        # in case it was replaced since the stat call above.
+        with open(path, 'rb', buffering=0) as fp:
+            key = self._key(os.fstat(fp.fileno()))
+            buf = _get_header(fp, self.matchers, _read_fp)
+        kind = _match_buffer(buf, self.matchers)
+
+        with self._lock:
+            self._entries[key] = kind
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return kind
+
+    def info(self):
+        """
+        Returns the cache statistics as a dict with the hits,
+        misses, evictions, size and maxsize keys.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def clear(self):
+        """
+        Drops every entry and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+def guess_many(objs, matchers=TYPES, processes=None, chunksize=1024):
+    """
+    Infers the type of every input of the given iterable.
+
+    Paths are read into a single reused header buffer and the
+    matcher dispatch table is resolved once for the whole batch.
+
+    When `processes` is given, matching runs on a process pool
+    instead: only the headers are shipped to the workers, which
+    load the matchers once and send back type indexes. Custom
+    matchers must then be picklable, i.e. importable classes.
+
+    Args:
+        objs: iterable of inputs accepted by `guess()`.
+        matchers: Type instances to match against, in priority order.
+        processes: number of worker processes, 0 for one per CPU.
+            Matches in the calling process if None.
+        chunksize: number of headers sent to a worker at once.
+
+    Yields:
+        The matched type instance for each input, in order.
+        None for inputs that do not match any type.
+
+    Raises:
+        TypeError: if an input is not a supported type.
+    """
+    if processes is not None:
+        return _guess_many_processes(objs, matchers, processes, chunksize)
+    return _guess_many(objs, matchers)
+
+
+def _guess_many(objs, matchers):
+    if _STATS is not None:
+        # Inputs are read and matched one by one to be counted.
+        for obj in objs:
+            yield match(obj, matchers) if obj else None
+        return
+
+    state = _compiled(matchers)
+    dispatch = state.dispatch
+    size = state.probe_size
+    header = bytearray(size)
+    view = memoryview(header)
+
+    for obj in objs:
+        if not obj:
+            yield None
+            continue
+
+        kind = type(obj)
+        if kind is bytes or kind is bytearray:
+            buf = obj[:size]
+            extension = state.extension(buf)
+            if extension:
+                buf = obj[:extension]
+        elif kind is str:
+            try:
+                with open(obj, 'rb', buffering=0) as fp:
+                    buf = view[:fp.readinto(header)]
+                    extension = state.extension(buf)
+                    if extension:
+                        buf = bytes(buf) + _read_header(fp, extension - size)
+            except (OSError, ValueError):
+                buf = _get_header(obj, matchers, get_sig_by_str_like)
+        else:
+            buf = _get_header(obj, matchers)
+
+        result = None
+        for matcher, check in (dispatch[buf[0]] if buf else state.unindexed):
+            if check(buf):
+                result = matcher
+                break
+        yield result
+
+
+_WORKER_MATCHERS = ()
+_WORKER_CODES = (0,)
+
+
+def _init_worker(matchers, codes):
+    global _WORKER_MATCHERS, _WORKER_CODES
+    _WORKER_MATCHERS = matchers
+    _WORKER_CODES = codes + (0,)
+
+
+def _classify_chunk(headers):
+    # Runs in a worker process. Returns type codes rather than
+    # positions, the index -1 of no match picking the trailing 0.
+    from array import array
+    codes = _WORKER_CODES
+    return array('L', [codes[index] for index in
+                       _match_indexes(headers, _WORKER_MATCHERS)])
+
+
+def _registry_of(matchers):
+    # Registry assigning the type codes of the given matchers.
+    return matchers._root if isinstance(matchers, Registry) else TYPES
+
+
+def _match_indexes(headers, matchers):
+    # Returns the index of the matched type for each header,
+    # -1 for no match or no input.
+    from array import array
+    indexes = {matcher: index for index, matcher in enumerate(matchers)}
+    if _STATS is not None:
+        return array('h', [indexes.get(_match_buffer(buf, matchers), -1)
+                           if buf is not None else -1 for buf in headers])
+    state = _compiled(matchers)
+    dispatch = state.dispatch
+
+    results = array('h')
+    for buf in headers:
+        result = -1
+        if buf is not None:
+            for matcher, check in (dispatch[buf[0]] if buf else
+                                   state.unindexed):
+                if check(buf):
+                    result = indexes[matcher]
+                    break
+        results.append(result)
+    return results
+
+
+def _guess_many_processes(objs, matchers, processes, chunksize):
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Workers report type codes, unregistered matchers being given
+    # codes above the unsigned short range for the run.
+    registered = _registry_of(matchers)._loaded_root()._codes
+    matchers = tuple(matchers)
+    codes = tuple(registered.get(kind, 0x10000 + position)
+                  for position, kind in enumerate(matchers))
+    kinds = dict(zip(codes, matchers))
+    size = _compiled(matchers).header_size
+
+    def chunks():
+        chunk = []
+        for obj in objs:
+            chunk.append(_bounded_header(obj, matchers, size))
+            if len(chunk) >= chunksize:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes,
+                             initializer=_init_worker,
+                             initargs=(matchers, codes)) as executor:
+        window = processes * 2
+        pending = deque()
+        for chunk in chunks():
+            pending.append(executor.submit(_classify_chunk, chunk))
+            if len(pending) >= window:
+                for code in pending.popleft().result():
+                    yield kinds.get(code)
+        while pending:
+            for code in pending.popleft().result():
+                yield kinds.get(code)
+
+
+def _match_indexes_numpy(headers, matchers, numpy):
+    # Vectorised version of _match_indexes(): the headers are stacked
+    # into a zero padded N x header_size matrix, and their rows grouped
+    # by leading byte once. Each matcher is only evaluated on the
+    # unmatched rows of the bytes it accepts, and each signature run
+    # as a mask and compare over the rows that passed the previous
+    # runs. The length vector rules the padding out, so that the
+    # verdicts are the ones of Signature.match().
+    # Headers are bytes no longer than the header size, or None.
+    state = _compiled(matchers)
+    width = state.header_size
+    count = len(headers)
+    padding = bytes(width)
+    matrix = numpy.frombuffer(
+        b''.join(buf.ljust(width, b'\0') if buf is not None else padding
+                 for buf in headers),
+        dtype=numpy.uint8).reshape(count, width)
+    lengths = numpy.array([len(buf) if buf is not None else -1
+                           for buf in headers], dtype=numpy.intp)
+    # Empty and missing headers go to group 256. Empty headers are
+    # candidates for every matcher, see _match_buffer().
+    firsts = (matrix[:, 0].astype(numpy.intp) if width else
+              numpy.zeros(count, numpy.intp))
+    firsts[lengths <= 0] = 256
+    order = numpy.argsort(firsts, kind='stable')
+    bounds = numpy.searchsorted(firsts[order], numpy.arange(258))
+    groups = [order[bounds[byte]:bounds[byte + 1]] for byte in range(256)]
+    empty = numpy.flatnonzero(lengths == 0)
+
+    results = numpy.full(count, -1, dtype=numpy.int16)
+    pending = lengths >= 0
+    for index, matcher in enumerate(state.kinds):
+        leading = _leading_bytes(matcher)
+        if len(leading) == 256:
+            rows = numpy.flatnonzero(pending)
+        else:
+            rows = numpy.concatenate([groups[byte] for byte in leading] +
+                                     [empty])
+            rows = rows[pending[rows]]
+        if type(matcher).match is not Type.match:
+            check = _check(matcher)
+            rows = [row for row in rows if check(headers[row])]
+            results[rows] = index
+            pending[rows] = False
+            continue
+        for sig in matcher.SIGNATURES:
+            hits = rows[lengths[rows] >= sig.length]
+            for offset, pattern, mask in sig.runs:
+                if not hits.size:
+                    break
+                columns = matrix[hits, offset:offset + len(pattern)]
+                if mask is not None:
+                    columns = columns & numpy.frombuffer(mask, numpy.uint8)
+                hits = hits[(columns == numpy.frombuffer(pattern, numpy.uint8)
+                             ).all(axis=1)]
+            if hits.size:
+                results[hits] = index
+                pending[hits] = False
+                rows = rows[pending[rows]]
+    return results
+
+
+def _bounded_header(obj, matchers, size):
+    # The header of the given input as bytes of at most size bytes,
+    # sliced straight out of bytes inputs, None for no input.
+    if not obj:
+        return None
+    kind = type(obj)
+    if kind is bytes:
+        return obj[:size]
+    if kind is bytearray:
+        return bytes(obj[:size])
+    return bytes(_get_header(obj, matchers)[:size])
+
+
+def match_codes(objs, matchers=TYPES, vectorize=None, chunksize=65536):
+    """
+    Matches every input of the given iterable, returning the type
+    code of the matched type of each one rather than the instance,
+    see `Registry.code()`. Unlike positions, codes do not change as
+    types are registered, and read back with `TypeArray`.
+
+    When NumPy is available the headers are matched in bulk, every
+    signature being evaluated at once over a matrix of headers, with
+    the same verdicts as `Type.match()`. Matchers overriding `match()`
+    are still called on each of the headers left unmatched.
+
+    Args:
+        objs: iterable of inputs accepted by `guess()`.
+        matchers: Type instances to match against, in priority order.
+        vectorize: use NumPy if True, pure Python if False,
+            NumPy when it can be imported if None.
+        chunksize: number of headers matched at once, which bounds
+            the size of the header matrix.
+
+    Returns:
+        numpy.ndarray of uint16 when vectorised, array('H') otherwise,
+        holding the code of the matched type for each input, 0 for
+        inputs that do not match any type.
+
+    Raises:
+        ImportError: if vectorize is True and NumPy is not installed.
+        TypeError: if an input is not a supported type.
+        ValueError: if a matcher is not registered, codes being those
+            of the registry of matchers, TYPES for plain sequences.
+    """
+    from array import array
+    from itertools import islice
+
+    numpy = None
+    if vectorize or vectorize is None:
+        try:
+            import numpy
+        except ImportError:
+            if vectorize:
+                raise
+
+    registered = _registry_of(matchers)._loaded_root()._codes
+    matchers = tuple(matchers)
+    try:
+        # Index -1, no match, picks the trailing 0.
+        codes = [registered[kind] for kind in matchers] + [0]
+    except KeyError as err:
+        raise ValueError('%r is not registered' % (err.args[0],))
+    size = _compiled(matchers).header_size
+    objs = iter(objs)
+    parts = []
+    while True:
+        headers = [_bounded_header(obj, matchers, size)
+                   for obj in islice(objs, chunksize)]
+        if not headers:
+            break
+        if numpy is not None:
+            parts.append(_match_indexes_numpy(headers, matchers, numpy))
+        else:
+            parts.append(_match_indexes(headers, matchers))
+
+    if numpy is not None:
+        codes = numpy.asarray(codes, numpy.uint16)
+        return codes[numpy.concatenate(parts or
+                                       [numpy.empty(0, numpy.int16)])]
+    results = array('H')
+    for part in parts:
+        results.extend([codes[index] for index in part])
+    return results
+
+
+def _kind_of(kinds, code):
+    # Resolves a stored code, 0 standing for no match.
+    if not code:
+        return None
+    try:
+        return kinds[code]
+    except KeyError:
+        raise ValueError('unknown type code %d' % code)
+
+
+class TypeArray(object):
+    """
+    Compact sequence of detection results, holding the type code of
+    each result in an array('H'), i.e. 2 bytes per result, 0 for no
+    match. Entries read back as the matchers of the registry.
+
+    Pickling only ships the codes, which are resolved against TYPES
+    in the receiving process. Built-in type codes are stable, so that
+    the raw codes, see `tobytes()`, may also be stored and reloaded.
+    Codes of matchers removed since still read back as them.
+
+    Args:
+        kinds: iterable of Type instances or None to store.
+        registry: Registry resolving the codes, TYPES by default.
+
+    Raises:
+        ValueError: if a type is not registered, or on reading a code
+            the registry never assigned.
+    """
+    __slots__ = ('codes', 'registry')
+
+    def __init__(self, kinds=(), registry=TYPES):
+        from array import array
+        self.codes = array('H')
+        self.registry = registry
+        self.extend(kinds)
+
+    @classmethod
+    def frombytes(cls, data, registry=TYPES):
+        """
+        Returns the TypeArray of the given raw codes, in native
+        byte order, see `tobytes()`.
+        """
+        result = cls(registry=registry)
+        result.codes.frombytes(data)
+        return result
+
+    def tobytes(self):
+        """
+        Returns the raw codes, two bytes each in native byte order.
+        """
+        return self.codes.tobytes()
+
+    def append(self, kind):
+        self.codes.append(self.registry.code(kind) if kind is not None else 0)
+
+    def extend(self, kinds):
+        codes = self.registry._loaded_root()._codes
+        try:
+            self.codes.extend(codes[kind] if kind is not None else 0
+                              for kind in kinds)
+        except KeyError as err:
+            raise ValueError('%r is not registered' % (err.args[0],))
+
+    def counts(self):
+        """
+        Returns the number of results of each type, as a dict
+        keyed by Type instance, None for no match.
+        """
+        from collections import Counter
+        kinds = self.registry._loaded_root()._kinds_by_code()
+        return {_kind_of(kinds, code): count
+                for code, count in Counter(self.codes).items()}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            result = TypeArray(registry=self.registry)
+            result.codes = self.codes[index]
+            return result
+        code = self.codes[index]
+        if not code:
+            return None
+        kind = self.registry.by_code(code)
+        if kind is None:
+            raise ValueError('unknown type code %d' % code)
+        return kind
+
+    def __iter__(self):
+        kinds = self.registry._loaded_root()._kinds_by_code()
+        for code in self.codes:
+            yield _kind_of(kinds, code)
+
+    def __reduce__(self):
+        return TypeArray.frombytes, (self.codes.tobytes(),)
+
+    def __repr__(self):
+        return 'TypeArray(%d results)' % len(self.codes)
+
+
+def guess_array(objs, matchers=TYPES, processes=None, chunksize=1024):
+    """
+    Same as `guess_many()`, returning the results as a `TypeArray`
+    rather than a generator, for batches too big to be held as lists.
+
+    Codes are resolved through the registry of the given matchers,
+    TYPES for plain sequences.
+
+    Returns:
+        TypeArray of the results, in order.
+    """
+    return TypeArray(guess_many(objs, matchers, processes, chunksize),
+                     _registry_of(matchers))
+
+
+def _selected(entry, root, patterns):
+    from fnmatch import fnmatch
+    relpath = os.path.relpath(entry.path, root)
+    return any(fnmatch(entry.name, pattern) or fnmatch(relpath, pattern)
+               for pattern in patterns)
+
+
+def walk_files(root, follow_symlinks=False, include=None, exclude=None,
+               max_depth=None, onerror=None):
+    """
+    Yields the paths of the regular files found under the given root,
+    using `os.scandir()` so that no extra stat call is made per entry.
+
+    Glob patterns are matched against both the entry name and its
+    path relative to root. Excluded directories are not descended.
+
+    Args:
+        root: directory to walk.
+        follow_symlinks: follow symbolic links to files and directories.
+        include: glob patterns files must match, all files if None.
+        exclude: glob patterns of files and directories to skip.
+        max_depth: maximum directory depth, 0 only lists root itself.
+            Unlimited if None.
+        onerror: callable receiving the OSError raised on entries
+            that cannot be read. Errors are ignored if None.
+
+    Yields:
+        File paths as strings.
+    """
+    root = os.fspath(root)
+    visited = set()
+    if follow_symlinks:
+        st = os.stat(root)
+        visited.add((st.st_dev, st.st_ino))
+    stack = [(root, 0)]
+
+    while stack:
+        top, depth = stack.pop()
+        try:
+            entries = os.scandir(top)
+        except OSError as err:
+            if onerror is not None:
+                onerror(err)
+            continue
+
+        with entries:
+            for entry in entries:
+                if exclude and _selected(entry, root, exclude):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=follow_symlinks):
+                        if max_depth is not None and depth >= max_depth:
+                            continue
+                        if follow_symlinks:
+                            st = entry.stat()
+                            if (st.st_dev, st.st_ino) in visited:
+                                continue
+                            visited.add((st.st_dev, st.st_ino))
+                        stack.append((entry.path, depth + 1))
+                    elif entry.is_file(follow_symlinks=follow_symlinks):
+                        if include and not _selected(entry, root, include):
+                            continue
+                        yield entry.path
+                except OSError as err:
+                    if onerror is not None:
+                        onerror(err)
+
+
+def scan(root, workers=None, matchers=TYPES, follow_symlinks=False,
+         include=None, exclude=None, max_depth=None, onerror=None,
+         cache=None, fallback=None):
+    """
+    Infers the type of every file under the given directory.
+
+    Headers are read concurrently on a thread pool, which keeps
+    latency-bound filesystems (NFS, FUSE mounts) busy. Results are
+    streamed back in walk order while the walk is still running.
+
+    Args:
+        root: directory to scan.
+        workers: number of reader threads, defaults to the
+            ThreadPoolExecutor default. A single worker reads the
+            files in the calling thread.
+        matchers: Type instances to match against, in priority order.
+        follow_symlinks: follow symbolic links to files and directories.
+        include: glob patterns files must match, all files if None.
+        exclude: glob patterns of files and directories to skip.
+        max_depth: maximum directory depth, unlimited if None.
+        onerror: callable receiving the OSError raised on files or
+            directories that cannot be read, which are then skipped.
+        cache: optional PathCache used instead of reading unchanged
+            files, `matchers` is then ignored in favor of the cache ones.
+        fallback: optional FileFallback asked about the files no
+            matcher recognises, in batches, which delays their results.
+
+    Yields:
+        (path, type instance) tuples, the type being None for
+        files that do not match any type.
+    """
+    def classify(path):
+        try:
+            if cache is not None:
+                return path, cache.guess(path)
+            return path, _match_buffer(
+                _get_header(path, matchers, get_sig_by_path), matchers)
+        except OSError as err:
+            return path, err
+
+    paths = walk_files(root, follow_symlinks=follow_symlinks,
+                       include=include, exclude=exclude,
+                       max_depth=max_depth, onerror=onerror)
+
+    results = _map_threads(classify, paths, workers)
+    if fallback is not None:
+        results = _with_fallback(results, fallback,
+                                 lambda result: result[1] is None)
+    for path, kind in results:
+        if isinstance(kind, OSError):
+            if onerror is not None:
+                onerror(kind)
+            continue
+        yield path, kind
+
+
+def _map_threads(func, items, workers=None):
+    # Yields func(item) for every item, in order, computed on a thread
+    # pool with at most 4 calls per worker in flight. A single worker
+    # runs the calls in the calling thread instead.
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) + 4)
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        window = workers * 4
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# streams
+
+def _read_header(stream, size=DEFAULT_HEADER_SIZE):
+    # Pipes and sockets may return short reads before EOF.
+    header = bytearray()
+    while len(header) < size:
+        chunk = stream.read(size - len(header))
+        if not chunk:
+            break
+        header += chunk
+    return header
+
+
+class _HeaderReplay(io.RawIOBase):
+    """
+    Raw reader replaying an already consumed header before
+    the rest of the underlying stream.
+    """
+
+    def __init__(self, header, stream):
+        super(_HeaderReplay, self).__init__()
+        self._header = memoryview(bytes(header))
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._header:
+            size = min(len(b), len(self._header))
+            b[:size] = self._header[:size]
+            self._header = self._header[size:]
+            return size
+        readinto = getattr(self._stream, 'readinto', None)
+        if readinto is not None:
+            return readinto(b)
+        data = self._stream.read(len(b))
+        if data is None:
+            return None
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._stream.close()
+            finally:
+                super(_HeaderReplay, self).close()
+
+
+def guess_stream(stream, matchers=TYPES):
+    """
+    Infers the type of a non-seekable stream, such as a pipe or a
+    socket file, without losing the bytes consumed to do so.
+
+    The header is read from the stream, then a new binary reader is
+    returned which yields the header again followed by the rest of
+    the stream. Closing the returned reader closes the stream.
+
+    Args:
+        stream: binary file-like object opened for reading.
+        matchers: Type instances to match against, in priority order.
+
+    Returns:
+        (type instance, reader) tuple, the type being None
+        if no type matches.
+    """
+    header = _get_header(stream, matchers, _read_header)
+    kind = _match_buffer(header, matchers)
+    return kind, io.BufferedReader(_HeaderReplay(header, stream))
+
+
+class _NeedMore(object):
+
+    def __repr__(self):
+        return 'NEED_MORE'
+
+
+NEED_MORE = _NeedMore()
+
+
+class Detector(object):
+    """
+    Incremental file type detector for content arriving in chunks.
+
+    Candidates are ruled in or out as bytes arrive, and a type is
+    reported as soon as it matches, e.g. after 2 bytes for a BMP.
+    Only the header bytes the matchers need are kept, see
+    `Registry.header_size`.
+
+    By default, higher priority candidates still undecided only hold
+    the result back once some of their signature bytes have arrived,
+    or when they refine it, e.g. Mkv a Webm, see `Signature.implies()`,
+    so that a BMP is not delayed until offset 8 rules out Webp. In
+    the rare cases where unrelated types would both match, the result
+    then differs from `match()`. Pass exact=True to always agree with
+    `match()`, at the cost of waiting for every undecided candidate.
+
+        detector = Detector()
+        for chunk in chunks:
+            kind = detector.feed(chunk)
+            if kind is not NEED_MORE:
+                break
+        else:
+            kind = detector.close()
+
+    Args:
+        matchers: Type instances to match against, in priority order.
+        exact: wait for every higher priority candidate to be decided.
+    """
+
+    def __init__(self, matchers=TYPES, exact=False):
+        self.matchers = matchers
+        self.exact = exact
+        self.candidates = list(matchers)
+        self.size = _compiled(matchers).header_size
+        self.header = bytearray()
+        self.done = False
+        self.result = None
+
+    def feed(self, chunk):
+        """
+        Adds the next chunk of content.
+
+        Returns:
+            The matched type instance, None if no type can match,
+            or NEED_MORE while undecided.
+        """
+        if self.done:
+            return self.result
+        if len(self.header) < self.size:
+            first = not self.header
+            self.header += chunk[:self.size - len(self.header)]
+            if first and self.header:
+                table = _dispatch_table(self.matchers)[self.header[0]]
+                self.candidates = [kind for kind in self.candidates
+                                   if kind in table]
+        return self._update(len(self.header) >= self.size)
+
+    def close(self):
+        """
+        Signals the end of the content, deciding every candidate.
+
+        Returns:
+            The matched type instance. Otherwise None.
+        """
+        if self.done:
+            return self.result
+        return self._update(True)
+
+    def _update(self, complete):
+        refined_by = _compiled(self.matchers).refined_by
+        candidates = []
+        result = NEED_MORE
+        undecided = False
+        waiting = []
+        for kind in self.candidates:
+            state = kind.check(self.header, complete)
+            if state is False:
+                continue
+            candidates.append(kind)
+            if state is None:
+                if self.exact or self._started(kind):
+                    undecided = True
+                else:
+                    waiting.append(kind)
+            elif not undecided and result is NEED_MORE:
+                if refined_by[kind].isdisjoint(waiting):
+                    result = kind
+                else:
+                    undecided = True
+        self.candidates = candidates
+
+        if result is NEED_MORE and not candidates:
+            result = None
+        if result is not NEED_MORE:
+            self.done = True
+            self.result = result
+        return result
+
+    def _started(self, kind):
+        # Whether some of the bytes of an undecided signature of the
+        # given type have arrived. Custom matchers never have.
+        if type(kind).match is not Type.match:
+            return False
+        size = len(self.header)
+        return any(sig.runs and sig.runs[0][0] < size and
+                   sig.check(self.header) is None
+                   for sig in kind.SIGNATURES)
+
+
+async def _read_header_async(stream, size):
+    header = bytearray()
+    while len(header) < size:
+        chunk = await stream.read(size - len(header))
+        if not chunk:
+            break
+        header += chunk
+    return header
+
+
+class _AsyncHeaderReplay(object):
+    """
+    Async reader replaying an already consumed header before
+    the rest of the underlying stream, see `guess_async()`.
+
+    Only `read()` is provided, the underlying stream is `stream`.
+    """
+
+    def __init__(self, header, stream):
+        self._header = bytes(header)
+        self.stream = stream
+
+    async def read(self, size=-1):
+        if not self._header:
+            return await self.stream.read(size)
+        if size is None or size < 0:
+            header, self._header = self._header, b''
+            return header + await self.stream.read(-1)
+        data = self._header[:size]
+        self._header = self._header[size:]
+        return data
+
+
+async def guess_async(obj, matchers=TYPES):
+    """
+    Infers the type of the given input without blocking the event loop.
+
+    Streams with a coroutine `read()` method, such as
+    `asyncio.StreamReader` or aiofiles objects, are read directly.
+    As with `guess_stream()`, a reader is then returned along with
+    the type, which yields the consumed header again followed by the
+    rest of the stream, so that e.g. an upload is not truncated:
+
+        kind, reader = await guess_async(request.content)
+        body = await reader.read()
+
+    Paths and blocking file-like objects are read on the loop's
+    default executor.
+
+    Args:
+        obj: path to file, bytes, bytearray, file-like or async stream.
+        matchers: Type instances to match against, in priority order.
+
+    Returns:
+        The matched type instance, None if no type matches. For async
+        streams, a (type instance, reader) tuple.
+
+    Raises:
+        TypeError: if obj is not a supported type.
+    """
+    import asyncio
+    from inspect import iscoroutinefunction
+
+    read = getattr(obj, 'read', None)
+    if read is not None and iscoroutinefunction(read):
+        state = _compiled(matchers)
+        buf = await _read_header_async(obj, state.probe_size)
+        size = state.extension(buf)
+        if size:
+            buf += await _read_header_async(obj, size - len(buf))
+        return _match_buffer(buf, matchers), _AsyncHeaderReplay(buf, obj)
+
+    if not obj:
+        return None
+    if read is not None or isinstance(obj, (str, os.PathLike)):
+        loop = asyncio.get_running_loop()
+        buf = await loop.run_in_executor(None, _get_header, obj, matchers)
+    else:
+        buf = _get_header(obj, matchers)
+    return _match_buffer(buf, matchers)
+
+
+async def scan_async(root, concurrency=None, matchers=TYPES, **options):
+    """
+    Asynchronous version of `scan()`.
+
+    The walk and the header reads run on a background thread pool
+    of `concurrency` readers. At most ``4 * concurrency`` results
+    are buffered ahead of the consumer.
+
+    Args:
+        root: directory to scan.
+        concurrency: number of reader threads, see `scan()` workers.
+        matchers: Type instances to match against, in priority order.
+        **options: follow_symlinks, include, exclude, max_depth and
+            onerror, see `scan()`.
+
+    Yields:
+        (path, type instance) tuples, the type being None for
+        files that do not match any type.
+    """
+    import asyncio
+    import threading
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    slots = threading.Semaphore(4 * (concurrency or
+                                     min(32, (os.cpu_count() or 1) + 4)))
+    done = object()
+
+    def produce():
+        try:
+            for result in scan(root, workers=concurrency, matchers=matchers,
+                               **options):
+                slots.acquire()
+                if stop.is_set():
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, result)
+            last = done
+        except Exception as err:
+            last = err
+        if not stop.is_set():
+            loop.call_soon_threadsafe(queue.put_nowait, last)
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            slots.release()
+            yield item
+    finally:
+        stop.set()
+        slots.release()
+        await producer
+
+
+# deep inspection
+
+class _DeepReader(object):
+    """
+    Random access reader over a path, seekable file-like or buffer,
+    refusing to read more than `budget` bytes in total.
+    """
+
+    def __init__(self, obj, budget):
+        self.remaining = budget
+        self._fp = self._view = None
+        self._close = False
+        self._position = None
+
+        if isinstance(obj, (bytes, bytearray, memoryview)) or _is_mmap(obj):
+            self._view = memoryview(obj).cast('B')
+            self.size = len(self._view)
+            return
+        if isinstance(obj, str):
+            try:
+                self._fp = open(obj, 'rb', buffering=0)
+            except (OSError, ValueError):
+                self._view = memoryview(get_sig_by_str_like(obj))
+                self.size = len(self._view)
+                return
+            self._close = True
+        elif isinstance(obj, os.PathLike):
+            self._fp = open(obj, 'rb', buffering=0)
+            self._close = True
+        elif hasattr(obj, 'read') and hasattr(obj, 'seek'):
+            self._fp = obj
+            self._position = obj.tell()
+        else:
+            raise TypeError('Unsupported type as file input: %s' % type(obj))
+        self.size = self._fp.seek(0, io.SEEK_END)
+
+    def read(self, offset, size):
+        size = min(size, self.remaining, max(self.size - offset, 0))
+        if size <= 0 or offset < 0:
+            return b''
+        if self._view is not None:
+            data = bytes(self._view[offset:offset + size])
+        else:
+            self._fp.seek(offset)
+            data = self._fp.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        if self._close:
+            self._fp.close()
+        elif self._position is not None:
+            self._fp.seek(self._position)
+
+
+def _uint16(buf, offset):
+    return int.from_bytes(buf[offset:offset + 2], 'little')
+
+
+def _uint32(buf, offset):
+    return int.from_bytes(buf[offset:offset + 4], 'little')
+
+
+_ZIP_MIMETYPES = {
+    b'application/epub+zip': 'epub',
+    b'application/vnd.oasis.opendocument.text': 'odt',
+    b'application/vnd.oasis.opendocument.spreadsheet': 'ods',
+    b'application/vnd.oasis.opendocument.presentation': 'odp',
+}
+
+
+def _inspect_zip(reader, header):
+    # Locates the end of central directory record, allowing for a
+    # trailing archive comment of up to 64 KiB.
+    tail = reader.read(reader.size - 22, 22)
+    if tail[:4] != b'PK\x05\x06':
+        start = max(reader.size - 22 - 0xFFFF, 0)
+        tail = reader.read(start, reader.size - start)
+        index = tail.rfind(b'PK\x05\x06')
+        if index < 0:
+            return None
+        tail = tail[index:index + 22]
+    if len(tail) < 22:
+        return None
+
+    directory = reader.read(_uint32(tail, 16), _uint32(tail, 12))
+    names = {}
+    offset = 0
+    while directory[offset:offset + 4] == b'PK\x01\x02':
+        if offset + 46 > len(directory):
+            break
+        name_size = _uint16(directory, offset + 28)
+        name = directory[offset + 46:offset + 46 + name_size]
+        names[name] = _uint32(directory, offset + 42)
+        offset += (46 + name_size + _uint16(directory, offset + 30) +
+                   _uint16(directory, offset + 32))
+
+    if b'mimetype' in names:
+        local = reader.read(names[b'mimetype'], 30)
+        if local[:4] == b'PK\x03\x04' and _uint16(local, 8) == 0:
+            start = (names[b'mimetype'] + 30 + _uint16(local, 26) +
+                     _uint16(local, 28))
+            content = reader.read(start, min(_uint32(local, 18), 128))
+            ext = _ZIP_MIMETYPES.get(content.strip())
+            if ext:
+                return ext
+    if b'AndroidManifest.xml' in names:
+        return 'apk'
+    if b'[Content_Types].xml' in names:
+        for name in names:
+            for prefix, ext in ((b'word/', 'docx'), (b'xl/', 'xlsx'),
+                                (b'ppt/', 'pptx')):
+                if name.startswith(prefix):
+                    return ext
+    if b'META-INF/MANIFEST.MF' in names:
+        return 'jar'
+    return None
+
+
+_FTYP_BRANDS = {
+    b'M4A ': 'm4a', b'M4B ': 'm4a', b'M4P ': 'm4a',
+    b'M4V ': 'm4v', b'M4VH': 'm4v', b'M4VP': 'm4v',
+    b'qt  ': 'mov',
+    b'isom': 'mp4', b'iso2': 'mp4', b'mp41': 'mp4', b'mp42': 'mp4',
+    b'avc1': 'mp4', b'dash': 'mp4', b'mmp4': 'mp4',
+}
+
+
+def _inspect_isobmff(reader, header):
+    # Reads the major and compatible brands of the leading ftyp box.
+    size = int.from_bytes(header[:4], 'big')
+    if header[4:8] != b'ftyp' or size < 16:
+        return None
+    box = header[:size] if size <= len(header) else reader.read(0, size)
+    for offset in [8] + list(range(16, len(box) - 3, 4)):
+        ext = _FTYP_BRANDS.get(bytes(box[offset:offset + 4]))
+        if ext:
+            return ext
+    return None
+
+
+_OLE_STREAMS = (
+    ('WordDocument', 'doc'),
+    ('Workbook', 'xls'),
+    ('Book', 'xls'),
+    ('PowerPoint Document', 'ppt'),
+)
+
+
+def _inspect_ole(reader, header):
+    # Looks for the well-known streams in the first sector of the
+    # compound file directory, where the root entries live.
+    if len(header) < 52:
+        return None
+    sector_size = 1 << _uint16(header, 30)
+    first = _uint32(header, 48)
+    if sector_size not in (512, 4096) or first >= 0xFFFFFFFA:
+        return None
+    sector = reader.read((first + 1) * sector_size, sector_size)
+    names = set()
+    for offset in range(0, len(sector) - 127, 128):
+        size = _uint16(sector, offset + 64)
+        if 2 <= size <= 64:
+            names.add(sector[offset:offset + size - 2].decode('utf-16-le',
+                                                              'replace'))
+    for name, ext in _OLE_STREAMS:
+        if name in names:
+            return ext
+    return None
+
+
+_OLE_MAGIC = b'\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1'
+
+_DEEP_INSPECTORS = {
+    Zip: _inspect_zip,
+    Epub: _inspect_zip,
+    Mp4: _inspect_isobmff,
+    M4v: _inspect_isobmff,
+    M4a: _inspect_isobmff,
+    Mov: _inspect_isobmff,
+}
+
+
+def guess_deep(obj, budget=1 << 20):
+    """
+    Infers the type of the given input, looking past the header
+    of container formats that cannot be told apart by it:
+
+    - ZIP based formats (docx, xlsx, pptx, odt, ods, odp, epub, jar,
+      apk) from the central directory and the mimetype entry.
+    - ISO base media formats (mp4, m4a, m4v, mov) from the ftyp box.
+    - OLE compound documents (doc, xls, ppt) from the directory.
+
+    Only the needed structures are read, with seeks, and never more
+    than `budget` bytes in total. The header based result is returned
+    when the budget runs out or the container cannot be parsed.
+
+    Args:
+        obj: path to file, bytes, bytearray, memoryview, mmap or
+            seekable file-like, whose position is restored.
+        budget: maximum number of bytes to read.
+
+    Returns:
+        The matched type instance. Otherwise None.
+
+    Raises:
+        TypeError: if obj is not a supported type.
+    """
+    if not obj:
+        return None
+
+    reader = _DeepReader(obj, budget)
+    try:
+        size = TYPES.header_size
+        header = reader.read(0, max(size, 512))
+        kind = _match_buffer(header[:size], TYPES)
+        inspector = _DEEP_INSPECTORS.get(type(kind))
+        if inspector is None and header[:8] == _OLE_MAGIC:
+            inspector = _inspect_ole
+        elif inspector is None and header[4:8] == b'ftyp':
+            inspector = _inspect_isobmff
+        ext = inspector(reader, header) if inspector else None
+    finally:
+        reader.close()
+
+    if ext:
+        kinds = TYPES.by_extension(ext)
+        if kinds:
+            return kinds[0]
+    return kind
+
+
+def guess_mime(obj):
+    """
+    Infers the file type of the given input
+    and returns its MIME type.
+
+    Args:
+        obj: path to file, bytes or bytearray.
+
+    Returns:
+        The matched MIME type as string. Otherwise None.
+
+    Raises:
+        TypeError: if obj is not a supported type.
+    """
+    kind = guess(obj)
+    return kind.mime if kind else kind
+
+
+def guess_extension(obj):
+    """
+    Infers the file type of the given input
+    and returns its RFC file extension.
+
+    Args:
+        obj: path to file, bytes or bytearray.
 
     Returns:
         The matched file extension as string. Otherwise None.
@@ -1427,11 +3909,243 @@ def guess_extension(obj):
     return kind.extension if kind else kind
 
 
+# categories
+
+IMAGE = TYPES.category('image')
+VIDEO = TYPES.category('video')
+AUDIO = TYPES.category('audio')
+FONT = TYPES.category('font')
+ARCHIVE = TYPES.category('archive')
+DOCUMENT = TYPES.category('document')
+
+
+def image_match(obj):
+    """
+    Matches the given input against the image type matchers only.
+
+    Category registries keep their own dispatch table and header
+    size, so that no other matcher is evaluated and no more header
+    bytes than the image signatures need are read.
+
+    Args:
+        obj: path to file, bytes or bytearray.
+
+    Returns:
+        Type instance if type matches. Otherwise None.
+
+    Raises:
+        TypeError: if obj is not a supported type.
+    """
+    return match(obj, IMAGE)
+
+
+def video_match(obj):
+    """
+    Matches the given input against the video type matchers only,
+    see `image_match()`.
+    """
+    return match(obj, VIDEO)
+
+
+def audio_match(obj):
+    """
+    Matches the given input against the audio type matchers only,
+    see `image_match()`.
+    """
+    return match(obj, AUDIO)
+
+
+def font_match(obj):
+    """
+    Matches the given input against the font type matchers only,
+    see `image_match()`.
+    """
+    return match(obj, FONT)
+
+
+def archive_match(obj):
+    """
+    Matches the given input against the archive type matchers only,
+    see `image_match()`.
+    """
+    return match(obj, ARCHIVE)
+
+
+def document_match(obj):
+    """
+    Matches the given input against the document types only.
+
+    Documents are ZIP or OLE containers which are only told apart
+    by deep inspection, see `guess_deep()`.
+
+    Returns:
+        Type instance if type matches. Otherwise None.
+    """
+    kind = guess_deep(obj)
+    return kind if kind in DOCUMENT else None
+
+
+def guess_image(obj):
+    """
+    Infers the type of the given input if it is an image.
+
+    Returns:
+        The matched image type instance. Otherwise None.
+    """
+    return image_match(obj) if obj else None
+
+
+def guess_video(obj):
+    """
+    Infers the type of the given input if it is a video.
+
+    Returns:
+        The matched video type instance. Otherwise None.
+    """
+    return video_match(obj) if obj else None
+
+
+def guess_audio(obj):
+    """
+    Infers the type of the given input if it is an audio file.
+
+    Returns:
+        The matched audio type instance. Otherwise None.
+    """
+    return audio_match(obj) if obj else None
+
+
+def guess_font(obj):
+    """
+    Infers the type of the given input if it is a font.
+
+    Returns:
+        The matched font type instance. Otherwise None.
+    """
+    return font_match(obj) if obj else None
+
+
+def guess_archive(obj):
+    """
+    Infers the type of the given input if it is an archive.
+
+    Returns:
+        The matched archive type instance. Otherwise None.
+    """
+    return archive_match(obj) if obj else None
+
+
+def guess_document(obj):
+    """
+    Infers the type of the given input if it is an office document.
+
+    Returns:
+        The matched document type instance. Otherwise None.
+    """
+    return document_match(obj) if obj else None
+
+
+CONFIRMED = 'confirmed'
+MISMATCH = 'mismatch'
+UNKNOWN = 'unknown'
+
+
+class Verification(object):
+    """
+    Outcome of `verify()`.
+
+    Attributes:
+        status: CONFIRMED if the content matches the claimed type,
+            MISMATCH if it matches another type, UNKNOWN if it
+            matches no type at all.
+        kind: the type instance the content matched, None if UNKNOWN.
+    """
+
+    def __init__(self, status, kind):
+        self.status = status
+        self.kind = kind
+
+    def __bool__(self):
+        return self.status == CONFIRMED
+
+    def __repr__(self):
+        return 'Verification(%s, %s)' % (
+            self.status, self.kind.extension if self.kind else None)
+
+
+def verify(obj, ext=None, mime=None):
+    """
+    Checks the content of the given input against its declared
+    file extension and/or MIME type.
+
+    Only the matchers of the claimed type are run first, a full
+    detection is done on mismatch only. When both ext and mime are
+    given, the claimed type must agree with both of them.
+
+    Note that a content matching the claimed type is confirmed even
+    if a more specific type would be detected, e.g. an EPUB claimed
+    as ZIP.
+
+    Types without a header signature, e.g. docx within a ZIP, and
+    containers whose header matched another type, e.g. an MP4 with
+    an unusual ftyp box size, are confirmed past the header with
+    `guess_deep()`, which needs a path, buffer or seekable file-like.
+
+    Args:
+        obj: path to file, bytes or bytearray.
+        ext: declared file extension string. E.g: jpg, png, mp4, mp3
+        mime: declared MIME string. E.g: image/jpeg, video/mpeg
+
+    Returns:
+        Verification instance, truthy if confirmed.
+
+    Raises:
+        TypeError: if obj is not a supported type.
+        ValueError: if neither ext nor mime is given.
+    """
+    if ext is None and mime is None:
+        raise ValueError('ext or mime must be given')
+    if not obj:
+        return Verification(UNKNOWN, None)
+    buf = _get_header(obj, TYPES)
+
+    claimed = None
+    if ext is not None:
+        claimed = TYPES.by_extension(ext)
+    if mime is not None:
+        by_mime = TYPES.by_mime(mime)
+        claimed = by_mime if claimed is None else [
+            kind for kind in claimed if kind in by_mime]
+
+    for kind in claimed or ():
+        if _check(kind)(buf):
+            return Verification(CONFIRMED, kind)
+
+    kind = _match_buffer(buf, TYPES)
+    if claimed and (type(kind) in _DEEP_INSPECTORS or
+                    any(not claim.SIGNATURES and
+                        type(claim).match is Type.match
+                        for claim in claimed)):
+        try:
+            deep = guess_deep(obj)
+        except (OSError, TypeError):
+            # Streams cannot be read again from the start.
+            deep = None
+        if deep is not None:
+            if deep in claimed:
+                return Verification(CONFIRMED, deep)
+            kind = deep
+    return Verification(MISMATCH if kind else UNKNOWN, kind)
+
+
 def get_type(mime=None, ext=None):
     """
     Returns the file type instance searching by
     MIME type or file extension.
 
+    Lookups are case insensitive, a leading dot in the
+    extension and MIME parameters are ignored.
+
     Args:
         ext: file extension string. E.g: jpg, png, mp4, mp3
         mime: MIME string. E.g: image/jpeg, video/mpeg
@@ -1439,18 +4153,26 @@ def get_type(mime=None, ext=None):
     Returns:
         The matched file type instance. Otherwise None.
     """
-    for kind in TYPES:
-        if kind.extension is ext or kind.mime is mime:
-            return kind
-    return None
+    kinds = []
+    if mime is not None:
+        kinds.extend(TYPES.by_mime(mime)[:1])
+    if ext is not None:
+        kinds.extend(TYPES.by_extension(ext)[:1])
+    return min(kinds, key=TYPES.position) if kinds else None
 
 
-def add_type(instance):
+def add_type(instance, priority=1, category=None):
     """
     Adds a new type matcher instance to the supported types.
 
+    The built-in types are registered with priority 0, so that
+    added types take precedence over them by default. Among added
+    types of the same priority, the last one added is tried first.
+
     Args:
         instance: Type inherited instance.
+        priority: matchers with a higher priority are tried first.
+        category: optional category name, e.g. image.
 
     Returns:
         None
@@ -1458,26 +4180,439 @@ def add_type(instance):
     if not isinstance(instance, Type):
         raise TypeError('instance must inherit from filetype.types.Type')
 
-    TYPES.insert(0, instance)
+    TYPES.add(instance, priority=priority, category=category)
 
 
+# fallback
 
+_NO_ANSWER = object()
 
 
-if __name__ == "__main__":
-    from io import BytesIO
+class FileFallback(object):
+    """
+    Fallback asking the `file` command line tool, i.e. libmagic, for
+    the type of the files no built-in matcher recognises.
+
+    A single ``file --mime-type -b -n -f -`` coprocess is started on
+    first use and kept running. Paths are written to its stdin and
+    its answers read back one line each, `window` paths at a time, so
+    that a batch of unknown files costs no process spawn. Answers are
+    cached by file identity and version, see `PathCache`. Safe to
+    share between threads, which take turns on the coprocess.
+
+    Results are the registered matcher of the MIME type found by
+    `file` if any, else a plain Type of that MIME type, with the
+    extension known to the `mimetypes` module. Data `file` does not
+    recognise either, i.e. application/octet-stream, is reported as
+    None, as are files that cannot be read.
 
-    file_path = "tests/files/1.tar.gz"
-    # kind = guess(file_path)
-    # kind = guess(open(file_path, 'rb').read())
-    stash = BytesIO()
-    stash.write(open(file_path, 'rb').read())
-    kind = guess(stash)
+        with FileFallback() as fallback:
+            kind = guess_path(path, fallback=fallback)
 
-    print kind
+    Args:
+        maxsize: maximum number of cached answers, the least recently
+            used one is evicted first. Unbounded if None.
+        window: number of paths written ahead of the answers read.
+        command: the `file` executable.
+    """
+
+    def __init__(self, maxsize=65536, window=64, command='file'):
+        import threading
+        from collections import OrderedDict
+
+        self.maxsize = maxsize
+        self.window = window
+        self.command = command
+        self.hits = 0
+        self.misses = 0
+        self.spawns = 0
+        self._entries = OrderedDict()
+        self._types = {}
+        self._process = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def available(self):
+        """
+        Whether the `file` tool can be executed, see
+        `file_command_exists()`. Custom commands are assumed to be.
+        """
+        return self.command != 'file' or file_command_exists()
+
+    def guess(self, path):
+        """
+        Asks `file` for the type of the file at the given path.
+
+        Returns:
+            Type instance, None if unknown or unreadable.
+        """
+        return self.guess_many([path])[0]
+
+    def guess_many(self, paths):
+        """
+        Asks `file` for the type of every given file, through the
+        coprocess for all of the files not cached.
+
+        Returns:
+            List of Type instances, None if unknown or unreadable.
+        """
+        results = [None] * len(paths)
+        keys = {}
+        with self._lock:
+            for index, path in enumerate(paths):
+                try:
+                    key = PathCache._key(os.stat(path))
+                except (OSError, ValueError):
+                    continue
+                try:
+                    results[index] = self._entries[key]
+                except KeyError:
+                    self.misses += 1
+                    keys[index] = key
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+            if not keys or not self.available:
+                return results
+
+            mimes = self._ask([paths[index] for index in keys])
+            for (index, key), mime in zip(keys.items(), mimes):
+                if mime is _NO_ANSWER:
+                    # Not cached, so that the file is asked about again.
+                    continue
+                kind = results[index] = self._type(mime)
+                self._entries[key] = kind
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return results
+
+    def info(self):
+        """
+        Returns the statistics as a dict with the hits, misses,
+        spawns, size and maxsize keys.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'spawns': self.spawns, 'size': len(self._entries),
+                    'maxsize': self.maxsize}
+
+    def close(self):
+        """
+        Stops the coprocess, a new one is started if needed again.
+        """
+        with self._lock:
+            self._stop()
+
+    def _type(self, mime):
+        if mime is None or mime == 'application/octet-stream':
+            return None
+        kinds = TYPES.by_mime(mime)
+        if kinds:
+            return kinds[0]
+        kind = self._types.get(mime)
+        if kind is None:
+            import mimetypes
+            ext = mimetypes.guess_extension(mime, strict=False)
+            kind = self._types[mime] = Type(mime, ext and ext.lstrip('.'))
+        return kind
+
+    def _ask(self, paths):
+        # Returns the MIME type of each path, None when file answered
+        # with an error, _NO_ANSWER when it could not be run or died.
+        # Paths holding a newline cannot be sent line by line and get
+        # a process of their own.
+        import subprocess
+
+        names = [os.fsencode(path) for path in paths]
+        mimes = [_NO_ANSWER] * len(names)
+        batch = [index for index, name in enumerate(names)
+                 if b'\n' not in name]
+        for index in set(range(len(names))).difference(batch):
+            try:
+                output = subprocess.run(
+                    [self.command, '--mime-type', '-b', '--', names[index]],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+            except OSError:
+                continue
+            self.spawns += 1
+            if output:
+                mimes[index] = _parse_mime(output)
+
+        for start in range(0, len(batch), self.window):
+            chunk = batch[start:start + self.window]
+            try:
+                process = self._start()
+                process.stdin.write(b''.join(names[index] + b'\n'
+                                             for index in chunk))
+                process.stdin.flush()
+                for index in chunk:
+                    line = process.stdout.readline()
+                    if not line:
+                        raise OSError('%s exited' % self.command)
+                    mimes[index] = _parse_mime(line)
+            except (OSError, ValueError):
+                # The coprocess died, the next batch starts a new one.
+                self._stop()
+        return mimes
+
+    def _start(self):
+        if self._process is None or self._process.poll() is not None:
+            import subprocess
+            self._process = subprocess.Popen(
+                [self.command, '--mime-type', '-b', '-n', '-f', '-'],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL)
+            self.spawns += 1
+        return self._process
+
+    def _stop(self):
+        process, self._process = self._process, None
+        if process is not None:
+            import subprocess
+            for stream in (process.stdin, process.stdout):
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def _parse_mime(output):
+    # Error messages, e.g. "cannot open `x' (No such file or
+    # directory)", are written in place of the MIME type.
+    mime = output.strip().decode('utf-8', 'replace')
+    if '/' not in mime or ' ' in mime:
+        return None
+    return mime
+
+
+def _with_fallback(results, fallback, missed, window=64):
+    # Yields the given (path, type, ...) results, resolving the types
+    # of the missed ones through the fallback, `window` misses at a
+    # time, in order.
+    pending = []
+    misses = []
+    for result in results:
+        pending.append(result)
+        if missed(result):
+            misses.append(len(pending) - 1)
+        if len(misses) >= window:
+            for result in _resolve_misses(pending, misses, fallback):
+                yield result
+            pending, misses = [], []
+    for result in _resolve_misses(pending, misses, fallback):
+        yield result
+
+
+def _resolve_misses(pending, misses, fallback):
+    if misses:
+        kinds = fallback.guess_many([pending[index][0] for index in misses])
+        for index, kind in zip(misses, kinds):
+            result = pending[index]
+            pending[index] = result[:1] + (kind,) + result[2:]
+    return pending
+
+
+# command line
+
+def _read_list(stream, separator):
+    # Yields the paths of a newline or NUL separated list, reading the
+    # stream in blocks so that the first paths are classified while
+    # the list is still being produced.
+    pending = b''
+    while True:
+        block = stream.read1(65536) if hasattr(stream, 'read1') else \
+            stream.read(65536)
+        if not block:
+            break
+        entries = (pending + block).split(separator)
+        pending = entries.pop()
+        for entry in entries:
+            if separator == b'\n':
+                entry = entry.rstrip(b'\r')
+            if entry:
+                yield os.fsdecode(entry)
+    if pending:
+        yield os.fsdecode(pending)
+
+
+def _cli_inputs(args, stdin):
+    for path in args.paths:
+        if path == '-':
+            yield path
+        elif os.path.isdir(path):
+            for entry in walk_files(path, follow_symlinks=args.follow_symlinks,
+                                    include=args.include,
+                                    exclude=args.exclude,
+                                    max_depth=args.max_depth,
+                                    onerror=args.onerror):
+                yield entry
+        else:
+            yield path
+    if args.files_from is not None:
+        separator = b'\0' if args.null else b'\n'
+        if args.files_from == '-':
+            for path in _read_list(stdin, separator):
+                yield path
+        else:
+            with open(args.files_from, 'rb') as fp:
+                for path in _read_list(fp, separator):
+                    yield path
+
+
+def _cli_classify(path, stdin, clock):
+    # Returns a (path, type, size, error, ns) record.
+    start = clock()
+    try:
+        if path == '-':
+            kind, _ = guess_stream(stdin)
+            size = None
+        else:
+            with open(path, 'rb', buffering=0) as fp:
+                size = os.fstat(fp.fileno()).st_size
+                kind = _match_buffer(_get_header(fp, TYPES, _read_fp), TYPES)
+    except OSError as err:
+        return path, None, None, err.strerror or str(err), clock() - start
+    return path, kind, size, None, clock() - start
+
+
+_CLI_FIELDS = ('path', 'mime', 'extension', 'size', 'time_us', 'error')
+
+
+def _cli_writer(output, fmt, header):
+    # Returns a function writing one record to output in the given format.
+    if fmt == 'jsonl':
+        import json
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+
+        def write(row):
+            output.write(encode(dict(zip(_CLI_FIELDS, row))))
+            output.write('\n')
+    elif fmt == 'text':
+        def write(row):
+            output.write('%s: %s\n' % (row[0], row[5] and 'ERROR: ' +
+                                        row[5] or row[1] or 'unknown'))
+    else:
+        import csv
+        writer = csv.writer(output, delimiter=',' if fmt == 'csv' else '\t',
+                            lineterminator='\n')
+        if header:
+            writer.writerow(_CLI_FIELDS)
+
+        def write(row):
+            writer.writerow(['' if value is None else value for value in row])
+    return write
+
+
+def main(argv=None):
+    """
+    Command line entry point, classifying files and writing one
+    record per input with its path, MIME type, extension, size,
+    classification time and error if any.
+
+        python filetype_.py photos/ --format csv
+        find /data -type f -print0 | python filetype_.py -0 -f - -j 16
+        curl -s https://example.com/x | python filetype_.py -
+
+    Args:
+        argv: command line arguments, defaults to sys.argv[1:].
 
-    if kind is None:
-        print('Cannot guess file type!')
+    Returns:
+        Exit status, 1 if some inputs could not be read.
+    """
+    import argparse
+    from time import perf_counter_ns
+
+    parser = argparse.ArgumentParser(
+        prog='filetype', description='Infers the type of files from '
+        'their content. Directories are walked recursively.')
+    parser.add_argument('paths', nargs='*', metavar='PATH',
+                        help='file or directory to classify, - for the '
+                        'content read from stdin')
+    parser.add_argument('-f', '--files-from', metavar='FILE',
+                        help='read the paths to classify from FILE, '
+                        '- for stdin')
+    parser.add_argument('-0', '--null', action='store_true',
+                        help='paths read with -f are NUL separated')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of reader threads')
+    parser.add_argument('--format', choices=('jsonl', 'csv', 'tsv', 'text'),
+                        default='jsonl', help='output format, '
+                        'defaults to jsonl')
+    parser.add_argument('--no-header', dest='header', action='store_false',
+                        help='omit the csv and tsv header row')
+    parser.add_argument('--fallback', action='store_true',
+                        help='ask the file tool about the files no '
+                        'matcher recognises, through a single process')
+    parser.add_argument('--max-depth', type=int, default=None,
+                        help='maximum directory depth')
+    parser.add_argument('-L', '--follow-symlinks', action='store_true',
+                        help='follow symbolic links to files and '
+                        'directories')
+    parser.add_argument('--include', action='append', metavar='GLOB',
+                        help='only classify the files matching GLOB')
+    parser.add_argument('--exclude', action='append', metavar='GLOB',
+                        help='skip the files and directories matching GLOB')
+    args = parser.parse_args(argv)
+    if not args.paths and args.files_from is None:
+        parser.error('no input given, pass paths or --files-from')
+    if args.paths.count('-') + (args.files_from == '-') > 1:
+        parser.error('stdin can only be read once')
+
+    # Directories that cannot be walked are reported as they are met.
+    walk_errors = []
+    args.onerror = walk_errors.append
+    stdin = sys.stdin.buffer
+    write = _cli_writer(sys.stdout, args.format, args.header)
+    status = 0
+
+    def classify(path):
+        return _cli_classify(path, stdin, perf_counter_ns)
+
+    records = _map_threads(classify, _cli_inputs(args, stdin), args.jobs)
+    fallback = FileFallback() if args.fallback else None
+    if fallback is not None:
+        records = _with_fallback(
+            records, fallback, lambda record: (record[1] is None and
+                                               record[3] is None and
+                                               record[0] != '-'))
+
+    try:
+        for path, kind, size, error, ns in records:
+            while walk_errors:
+                err = walk_errors.pop(0)
+                write((err.filename, None, None, None, None,
+                       err.strerror or str(err)))
+                status = 1
+            write((path, kind.mime if kind else None,
+                   kind.extension if kind else None, size,
+                   round(ns / 1000.0, 1), error))
+            if error is not None:
+                status = 1
+        for err in walk_errors:
+            write((err.filename, None, None, None, None,
+                   err.strerror or str(err)))
+            status = 1
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away, e.g. when piped into head.
+        sys.stderr.close()
+    finally:
+        if fallback is not None:
+            fallback.close()
+    return status
 
-    print('File extension: %s' % kind.extension)
-    print('File MIME type: %s' % kind.mime)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+import asyncio
+import io
+
+import pytest
+
+import filetype_
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 4
+
+
+class Trickle(object):
+    # An aiofiles-like stream returning at most 5 bytes per read.
+
+    def __init__(self, content):
+        self._fp = io.BytesIO(content)
+
+    async def read(self, size=-1):
+        await asyncio.sleep(0)
+        return self._fp.read(5 if size is None or size < 0 else min(size, 5))
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_stream_reader_is_replayed():
+    async def main():
+        stream = asyncio.StreamReader()
+        stream.feed_data(PNG)
+        stream.feed_eof()
+        kind, reader = await filetype_.guess_async(stream)
+        return kind, await reader.read()
+
+    kind, content = run(main())
+    assert kind.extension == 'png'
+    assert content == PNG
+
+
+def test_short_reads_are_replayed():
+    async def main():
+        kind, reader = await filetype_.guess_async(Trickle(PNG))
+        chunks = []
+        while True:
+            chunk = await reader.read(100)
+            if not chunk:
+                return kind, b''.join(chunks)
+            chunks.append(chunk)
+
+    kind, content = run(main())
+    assert kind.extension == 'png'
+    assert content == PNG
+
+
+def test_other_inputs(tmp_path):
+    path = tmp_path / 'a.png'
+    path.write_bytes(PNG)
+
+    async def main():
+        return [await filetype_.guess_async(obj)
+                for obj in (PNG, str(path), path, io.BytesIO(PNG), b'', None)]
+
+    assert [kind and kind.extension for kind in run(main())] == [
+        'png', 'png', 'png', 'png', None, None]
+
+
+def test_scan_async(tmp_path):
+    for index in range(20):
+        (tmp_path / ('%02d.png' % index)).write_bytes(PNG)
+    (tmp_path / 'data.bin').write_bytes(b'data')
+
+    async def collect(**options):
+        return [result async for result in filetype_.scan_async(
+            str(tmp_path), **options)]
+
+    expected = list(filetype_.scan(str(tmp_path)))
+    assert run(collect()) == expected
+    assert run(collect(concurrency=1)) == expected
+
+
+def test_scan_async_early_break(tmp_path):
+    for index in range(50):
+        (tmp_path / ('%02d.png' % index)).write_bytes(PNG)
+
+    async def first():
+        async for result in filetype_.scan_async(str(tmp_path),
+                                                 concurrency=2):
+            return result
+
+    path, kind = run(first())
+    assert kind.extension == 'png'
+
+
+class Failing(filetype_.Type):
+    __slots__ = ()
+
+    def __init__(self):
+        super(Failing, self).__init__('application/x-failing', 'failing')
+
+    def match(self, buf):
+        raise RuntimeError('matcher failed')
+
+
+def test_scan_async_producer_error(tmp_path):
+    (tmp_path / 'a.png').write_bytes(PNG)
+
+    async def main():
+        async for _ in filetype_.scan_async(str(tmp_path),
+                                            matchers=[Failing()]):
+            pass
+
+    with pytest.raises(RuntimeError, match='matcher failed'):
+        run(main())
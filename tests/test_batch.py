@@ -0,0 +1,36 @@
+import random
+
+import pytest
+
+import filetype_
+from test_custom import Legacy
+from test_signatures import samples
+
+
+def expected(contents, matchers):
+    results = []
+    for content in contents:
+        kind = filetype_.match(content, matchers) if content else None
+        results.append(matchers.code(kind) if kind else 0)
+    return results
+
+
+def test_match_codes_python():
+    contents = list(samples(random.Random(3))) + [None, b'']
+    codes = filetype_.match_codes(contents, vectorize=False)
+    assert codes.typecode == 'H'
+    assert list(codes) == expected(contents, filetype_.TYPES)
+
+
+def test_match_codes_numpy_parity():
+    pytest.importorskip('numpy')
+    contents = list(samples(random.Random(4))) + [None, b'', b'\xFF']
+    matchers = filetype_.Registry(list(filetype_.TYPES) + [Legacy()])
+    contents.append(b'LEGACY' + bytes(10))
+    for registry in (filetype_.TYPES, matchers):
+        vectorized = filetype_.match_codes(contents, registry,
+                                           vectorize=True, chunksize=500)
+        assert vectorized.dtype.name == 'uint16'
+        assert list(vectorized) == list(filetype_.match_codes(
+            contents, registry, vectorize=False))
+        assert list(vectorized) == expected(contents, registry)
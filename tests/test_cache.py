@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import filetype_
+
+GIF = b'GIF89a' + bytes(10)
+PNG = b'\x89PNG' + bytes(12)
+
+
+def write(path, content, mtime_ns=None):
+    path.write_bytes(content)
+    if mtime_ns is not None:
+        os.utime(str(path), ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def test_hits_and_misses(tmp_path):
+    cache = filetype_.PathCache()
+    path = write(tmp_path / 'a', GIF, 10 ** 18)
+    assert cache.guess(path).extension == 'gif'
+    assert cache.info() == {'hits': 0, 'misses': 1, 'evictions': 0,
+                            'size': 1, 'maxsize': 65536}
+
+    # Same identity, mtime and size: served without reading the file.
+    write(tmp_path / 'a', PNG, 10 ** 18)
+    assert cache.guess(path).extension == 'gif'
+    assert filetype_.guess_path(path, cache=cache).extension == 'gif'
+    assert cache.info()['hits'] == 2
+
+    with pytest.raises(OSError):
+        cache.guess(str(tmp_path / 'missing'))
+    assert cache.info()['misses'] == 1
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.info()['hits'] == 0
+
+
+def test_lru_eviction(tmp_path):
+    cache = filetype_.PathCache(maxsize=2)
+    a, b, c = (write(tmp_path / name, GIF) for name in 'abc')
+    cache.guess(a)
+    cache.guess(b)
+    cache.guess(a)
+    cache.guess(c)
+    assert len(cache) == 2
+    assert cache.info()['evictions'] == 1
+
+    cache.guess(a)
+    assert cache.info()['hits'] == 2
+    cache.guess(b)
+    assert cache.info()['misses'] == 4
+    assert cache.info()['evictions'] == 2
+
+
+def test_invalidation(tmp_path):
+    cache = filetype_.PathCache()
+    path = write(tmp_path / 'a', GIF, 10 ** 18)
+    assert cache.guess(path).extension == 'gif'
+
+    # Same size, newer mtime.
+    write(tmp_path / 'a', PNG, 10 ** 18 + 1)
+    assert cache.guess(path).extension == 'png'
+
+    # Same mtime, other size.
+    write(tmp_path / 'a', b'unknown', 10 ** 18 + 1)
+    assert cache.guess(path) is None
+    assert cache.info()['misses'] == 3
+    assert cache.info()['hits'] == 0
@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import os
+import sys
+
+import pytest
+
+import filetype_
+from test_fallback import FAKE_FILE, command, unknown
+
+GIF = b'GIF89a' + bytes(10)
+PNG = b'\x89PNG' + bytes(12)
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for name, content in [('a.gif', GIF), ('b.png', PNG), ('c', b'text')]:
+        path = tmp_path / name
+        path.write_bytes(content)
+        paths.append(str(path))
+    return paths
+
+
+def stdin(monkeypatch, data):
+    monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(data)))
+
+
+def run(capsys, *argv):
+    status = filetype_.main(list(argv))
+    return status, capsys.readouterr().out
+
+
+def records(output):
+    return [json.loads(line) for line in output.splitlines()]
+
+
+def test_jsonl(capsys, files):
+    status, output = run(capsys, *files)
+    assert status == 0
+    rows = records(output)
+    assert [(row['path'], row['mime'], row['extension'], row['size'],
+             row['error']) for row in rows] == [
+        (files[0], 'image/gif', 'gif', 16, None),
+        (files[1], 'image/png', 'png', 16, None),
+        (files[2], None, None, 4, None)]
+    assert all(row['time_us'] >= 0 for row in rows)
+
+    status, output = run(capsys, os.path.dirname(files[0]))
+    assert sorted(row['path'] for row in records(output)) == files
+
+
+def test_csv_and_tsv(capsys, files):
+    for fmt, delimiter in (('csv', ','), ('tsv', '\t')):
+        status, output = run(capsys, '--format', fmt, files[0], files[2])
+        rows = list(csv.reader(io.StringIO(output), delimiter=delimiter))
+        assert rows[0] == ['path', 'mime', 'extension', 'size', 'time_us',
+                           'error']
+        assert rows[1][:4] == [files[0], 'image/gif', 'gif', '16']
+        assert rows[2][:4] == [files[2], '', '', '4']
+        assert rows[1][5] == rows[2][5] == ''
+
+        status, output = run(capsys, '--format', fmt, '--no-header',
+                             files[0])
+        assert len(output.splitlines()) == 1
+
+
+def test_files_from_stdin(capsys, monkeypatch, files, tmp_path):
+    newline = tmp_path / 'a\nb'
+    newline.write_bytes(GIF)
+    paths = files + [str(newline)]
+    stdin(monkeypatch, b'\0'.join(os.fsencode(path) for path in paths))
+    status, output = run(capsys, '-0', '-f', '-')
+    assert status == 0
+    assert [(row['path'], row['extension']) for row in records(output)] == [
+        (files[0], 'gif'), (files[1], 'png'), (files[2], None),
+        (str(newline), 'gif')]
+
+
+def test_stdin_content(capsys, monkeypatch, files):
+    stdin(monkeypatch, PNG + bytes(1000))
+    status, output = run(capsys, files[0], '-')
+    assert status == 0
+    assert [(row['path'], row['mime'], row['size'])
+            for row in records(output)] == [
+        (files[0], 'image/gif', 16), ('-', 'image/png', None)]
+
+    with pytest.raises(SystemExit):
+        filetype_.main(['-', '-f', '-'])
+
+
+def test_unreadable_paths(capsys, files, tmp_path):
+    missing = str(tmp_path / 'missing')
+    status, output = run(capsys, files[0], missing)
+    assert status == 1
+    rows = records(output)
+    assert rows[0]['error'] is None
+    assert rows[1]['path'] == missing
+    assert rows[1]['error'] == 'No such file or directory'
+
+    status, output = run(capsys, '--format', 'text', missing)
+    assert status == 1
+    assert output == '%s: ERROR: No such file or directory\n' % missing
+
+
+def test_fallback(capsys, monkeypatch, files, tmp_path):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    command(bin_dir, 'file', FAKE_FILE)
+    monkeypatch.setenv('PATH', str(bin_dir) + os.pathsep +
+                       os.environ.get('PATH', ''))
+    monkeypatch.setattr(filetype_, '_FILE_EXIST', None)
+
+    fake = unknown(tmp_path, 'd', 'text/x-fake')
+    status, output = run(capsys, '--fallback', files[0], fake)
+    assert status == 0
+    assert [(row['path'], row['mime']) for row in records(output)] == [
+        (files[0], 'image/gif'), (fake, 'text/x-fake')]
@@ -0,0 +1,91 @@
+import pickle
+from array import array
+
+import pytest
+
+import filetype_
+from test_registry import Custom
+
+GIF = b'GIF89a' + bytes(10)
+JPEG = b'\xFF\xD8\xFF\xE0' + bytes(10)
+
+
+def test_codes():
+    jpeg = filetype_.get_type(ext='jpg')
+    assert filetype_.TYPES.code(jpeg) == filetype_.Jpeg.CODE
+    assert filetype_.TYPES.by_code(filetype_.Jpeg.CODE) is jpeg
+    assert filetype_.TYPES.by_code(0xFFFF) is None
+    with pytest.raises(ValueError):
+        filetype_.TYPES.code(filetype_.Jpeg())
+
+    registry = filetype_.Registry([jpeg])
+    first, second = Custom('first'), Custom('second')
+    registry.add(first)
+    registry.add(second)
+    assert registry.code(first) == filetype_.FIRST_CUSTOM_CODE
+    assert registry.code(second) == filetype_.FIRST_CUSTOM_CODE + 1
+
+
+def test_removed_codes_stay_resolvable():
+    jpeg = filetype_.Jpeg()
+    custom = Custom('custom')
+    registry = filetype_.Registry([jpeg])
+    registry.add(custom)
+    results = filetype_.TypeArray([custom, None, jpeg, custom], registry)
+    code = registry.code(custom)
+
+    registry.remove(custom)
+    assert registry.by_code(code) is custom
+    assert results[0] is custom
+    assert list(results) == [custom, None, jpeg, custom]
+    assert results.counts() == {custom: 2, None: 1, jpeg: 1}
+    with pytest.raises(ValueError):
+        results.append(custom)
+
+    other = Custom('other')
+    registry.add(other)
+    assert registry.code(other) != code
+    registry.add(custom)
+    assert registry.by_code(code) is custom
+
+
+def test_unknown_codes_raise():
+    results = filetype_.TypeArray.frombytes(array('H', [0xFFFF]).tobytes())
+    assert len(results) == 1
+    with pytest.raises(ValueError):
+        results[0]
+    with pytest.raises(ValueError):
+        list(results)
+
+
+def test_pickling_and_raw_codes():
+    results = filetype_.guess_array([GIF, JPEG, b'unknown', None])
+    kinds = [filetype_.get_type(ext='gif'), filetype_.get_type(ext='jpg'),
+             None, None]
+    assert list(results) == kinds
+
+    assert list(pickle.loads(pickle.dumps(results))) == kinds
+    data = results.tobytes()
+    assert len(data) == 2 * len(results)
+    assert list(filetype_.TypeArray.frombytes(data)) == kinds
+    assert list(results[1:3]) == kinds[1:3]
+
+
+def test_codes_do_not_shift_on_registration():
+    gif = filetype_.get_type(ext='gif')
+    jpeg = filetype_.get_type(ext='jpg')
+    contents = [JPEG, GIF, JPEG, b'unknown'] * 2
+    before = list(filetype_.match_codes(contents, vectorize=False))
+    results = filetype_.guess_many(contents, processes=1, chunksize=1)
+    assert next(results) is jpeg
+
+    custom = Custom('custom')
+    filetype_.add_type(custom)
+    try:
+        assert list(results) == [gif, jpeg, None, jpeg, gif, jpeg, None]
+        after = list(filetype_.match_codes(contents, vectorize=False))
+        assert after == [filetype_.TYPES.code(custom) if code == jpeg.CODE
+                         else code for code in before]
+        assert filetype_.TYPES.by_code(before[0]) is jpeg
+    finally:
+        filetype_.TYPES.remove(custom)
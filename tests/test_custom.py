@@ -0,0 +1,67 @@
+import filetype_
+
+
+class Legacy(filetype_.Type):
+    # A matcher written for the bytearray headers of older versions.
+    __slots__ = ()
+
+    def __init__(self):
+        super(Legacy, self).__init__('application/x-legacy', 'legacy')
+
+    def match(self, buf):
+        return buf.startswith(b'LEGACY')
+
+
+CONTENT = b'LEGACY' + bytes(1000)
+
+
+def test_legacy_match_gets_bytes(tmp_path):
+    path = tmp_path / 'file.legacy'
+    path.write_bytes(CONTENT)
+    legacy = Legacy()
+    matchers = filetype_.Registry([legacy, filetype_.Jpeg()])
+
+    assert list(filetype_.guess_many([str(path), CONTENT, memoryview(CONTENT)],
+                                     matchers)) == [legacy] * 3
+    assert filetype_.match(memoryview(CONTENT), matchers) is legacy
+    assert list(filetype_.match_codes([memoryview(CONTENT)], matchers,
+                                      vectorize=False)) == [
+        matchers.code(legacy)]
+
+    filetype_.add_type(legacy)
+    try:
+        assert filetype_.guess_path(str(path), use_mmap=True) is legacy
+        assert filetype_.guess_bytes(memoryview(CONTENT)) is legacy
+        assert filetype_.verify(memoryview(CONTENT), ext='legacy').kind is legacy
+    finally:
+        filetype_.TYPES.remove(legacy)
+
+
+class Trailer(filetype_.Type):
+    # A signature past DEFAULT_HEADER_SIZE, extending header reads.
+    __slots__ = ()
+    SIGNATURES = (filetype_.Signature((0, b'TR'), (1000, b'TRAILER')),)
+
+    def __init__(self):
+        super(Trailer, self).__init__('application/x-trailer', 'trailer')
+
+
+def test_extended_header_reads_open_once(tmp_path, monkeypatch):
+    path = tmp_path / 'file.trailer'
+    path.write_bytes(b'TR' + bytes(998) + b'TRAILER')
+    trailer = Trailer()
+    matchers = filetype_.Registry([filetype_.Jpeg(), trailer])
+
+    opened = []
+
+    def spy(*args, **kwargs):
+        opened.append(args[0])
+        return open(*args, **kwargs)
+
+    monkeypatch.setattr(filetype_, 'open', spy, raising=False)
+    assert filetype_.match(str(path), matchers) is trailer
+    assert filetype_.match(path, matchers) is trailer
+    assert opened == [str(path), path]
+
+    content = 'TR' + ' ' * 998 + 'TRAILER'
+    assert filetype_.match(content, matchers) is trailer
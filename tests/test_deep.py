@@ -0,0 +1,111 @@
+import io
+import zipfile
+
+import pytest
+
+import filetype_
+
+
+def zip_content(*names, mimetype=None):
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+        if mimetype is not None:
+            archive.writestr('mimetype', mimetype,
+                             compress_type=zipfile.ZIP_STORED)
+        for name in names:
+            archive.writestr(name, 'x' * 100)
+    return out.getvalue()
+
+
+def ole_content(stream):
+    # A compound file header with 512 byte sectors whose directory
+    # starts at sector 0, i.e. right after the header.
+    header = bytearray(512)
+    header[:8] = b'\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1'
+    header[28:32] = b'\xFE\xFF\x09\x00'
+    header[48:52] = (0).to_bytes(4, 'little')
+    directory = bytearray(512)
+    for index, name in enumerate(('Root Entry', stream)):
+        encoded = (name + '\0').encode('utf-16-le')
+        directory[index * 128:index * 128 + len(encoded)] = encoded
+        directory[index * 128 + 64:index * 128 + 66] = len(
+            encoded).to_bytes(2, 'little')
+    return bytes(header + directory)
+
+
+def ftyp_content(major, *compatible):
+    brands = major + b'\x00\x00\x00\x00' + b''.join(compatible)
+    box = (8 + len(brands)).to_bytes(4, 'big') + b'ftyp' + brands
+    return box + bytes(64)
+
+
+CONTENTS = [
+    (zip_content('[Content_Types].xml', 'word/document.xml'), 'docx'),
+    (zip_content('[Content_Types].xml', 'xl/workbook.xml'), 'xlsx'),
+    (zip_content('[Content_Types].xml', 'ppt/presentation.xml'), 'pptx'),
+    (zip_content('content.xml',
+                 mimetype='application/vnd.oasis.opendocument.text'), 'odt'),
+    (zip_content('content.xml',
+                 mimetype='application/vnd.oasis.opendocument.spreadsheet'),
+     'ods'),
+    (zip_content('content.xml',
+                 mimetype='application/vnd.oasis.opendocument.presentation'),
+     'odp'),
+    (zip_content('content.opf', mimetype='application/epub+zip'), 'epub'),
+    (zip_content('META-INF/MANIFEST.MF', 'Main.class'), 'jar'),
+    (zip_content('AndroidManifest.xml', 'classes.dex',
+                 'META-INF/MANIFEST.MF'), 'apk'),
+    (zip_content('readme.txt'), 'zip'),
+    (ole_content('WordDocument'), 'doc'),
+    (ole_content('Workbook'), 'xls'),
+    (ole_content('Book'), 'xls'),
+    (ole_content('PowerPoint Document'), 'ppt'),
+    (ftyp_content(b'M4A ', b'isom'), 'm4a'),
+    (ftyp_content(b'XXXX', b'qt  '), 'mov'),
+    (ftyp_content(b'isom', b'mp41'), 'mp4'),
+]
+
+
+@pytest.mark.parametrize('content,ext', CONTENTS)
+def test_guess_deep(content, ext, tmp_path):
+    path = tmp_path / ('file.' + ext)
+    path.write_bytes(content)
+    assert filetype_.guess_deep(content).extension == ext
+    assert filetype_.guess_deep(str(path)).extension == ext
+
+    stream = io.BytesIO(content)
+    stream.seek(3)
+    assert filetype_.guess_deep(stream).extension == ext
+    assert stream.tell() == 3
+
+
+def test_guess_deep_budget():
+    # The central directory is out of reach, the header type is kept.
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w') as archive:
+        archive.writestr('[Content_Types].xml', 'x')
+        archive.writestr('word/document.xml', bytes(4096))
+    content = out.getvalue()
+    assert filetype_.guess_deep(content).extension == 'docx'
+    assert filetype_.guess_deep(content, budget=520).extension == 'zip'
+
+
+@pytest.mark.parametrize('content,ext', CONTENTS)
+def test_verify_types_without_signature(content, ext):
+    kind = filetype_.get_type(ext=ext)
+    for result in (filetype_.verify(content, ext=ext),
+                   filetype_.verify(content, mime=kind.mime),
+                   filetype_.verify(io.BytesIO(content), ext=ext)):
+        assert result, result
+        assert result.kind.extension == ext
+
+
+def test_verify_wrong_deep_claim():
+    xlsx = zip_content('[Content_Types].xml', 'xl/workbook.xml')
+    result = filetype_.verify(xlsx, ext='docx')
+    assert result.status == filetype_.MISMATCH
+    assert result.kind.extension == 'xlsx'
+
+    result = filetype_.verify(zip_content('readme.txt'), ext='docx')
+    assert result.status == filetype_.MISMATCH
+    assert result.kind.extension == 'zip'
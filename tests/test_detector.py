@@ -0,0 +1,53 @@
+import random
+
+import filetype_
+from test_signatures import samples
+
+
+def detect(buf, exact=False):
+    # Feeds the content byte by byte, returning the result and the
+    # number of bytes it took.
+    detector = filetype_.Detector(exact=exact)
+    for size in range(len(buf)):
+        kind = detector.feed(buf[size:size + 1])
+        if kind is not filetype_.NEED_MORE:
+            return kind, size + 1
+    return detector.close(), len(buf)
+
+
+def extension(kind):
+    return kind.extension if kind else None
+
+
+EPUB = b'PK\x03\x04' + bytes(26) + b'mimetypeapplication/epub+zip'
+ZIP = b'PK\x03\x04' + bytes(60)
+CR2 = b'II*\x00\x10\x00\x00\x00CR' + bytes(8)
+TIFF = b'II*\x00\x10\x00\x00\x00XX' + bytes(8)
+MKV = b'\x1A\x45\xDF\xA3\x93\x42\x82\x88matroska' + bytes(30)
+MKV_LATE = b'\x1A\x45\xDF\xA3\x01' + bytes(26) + b'matroska' + bytes(8)
+WEBM = b'\x1A\x45\xDF\xA3\x01' + bytes(50)
+
+
+def test_refining_types_hold_the_result_back():
+    for buf, ext in ((EPUB, 'epub'), (ZIP, 'zip'), (CR2, 'cr2'),
+                     (TIFF, 'tif'), (MKV, 'mkv'), (MKV_LATE, 'mkv'),
+                     (WEBM, 'webm')):
+        assert extension(filetype_.match(buf)) == ext
+        assert extension(detect(buf)[0]) == ext
+        assert extension(detect(buf, exact=True)[0]) == ext
+
+    # Webm is reported once the late Mkv signature is ruled out.
+    assert detect(WEBM) == (filetype_.get_type(ext='webm'), 32)
+
+
+def test_unrelated_types_do_not_hold_the_result_back():
+    # Webp, whose signature starts at offset 8, is tried before Bmp.
+    bmp = b'BM' + bytes(255) + b'ustar'
+    assert extension(filetype_.match(bmp)) == 'bmp'
+    assert detect(bmp) == (filetype_.get_type(ext='bmp'), 2)
+    assert detect(bmp, exact=True) == (filetype_.get_type(ext='bmp'), 9)
+
+
+def test_exact_detector_agrees_with_match():
+    for buf in samples(random.Random(2)):
+        assert detect(buf, exact=True)[0] is filetype_.match(buf), buf
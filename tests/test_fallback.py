@@ -0,0 +1,139 @@
+import os
+import stat
+import sys
+
+import filetype_
+
+# Stands in for file(1): the MIME type of a file is its first line.
+FAKE_FILE = '''#!%s
+import sys
+
+
+def mime(path):
+    try:
+        with open(path, 'rb') as fp:
+            return fp.readline().strip().decode()
+    except OSError:
+        return "cannot open `%%s' (No such file or directory)" %% path
+
+
+if '--version' in sys.argv:
+    print('file-5.45')
+elif '-f' in sys.argv:
+    for line in sys.stdin.buffer:
+        sys.stdout.write(mime(line.rstrip(b'\\n').decode()) + '\\n')
+        sys.stdout.flush()
+else:
+    print(mime(sys.argv[-1]))
+''' % sys.executable
+
+DEAD_FILE = '#!%s\nimport sys\nsys.exit(0)\n' % sys.executable
+
+
+def command(tmp_path, name, source):
+    path = tmp_path / name
+    path.write_text(source)
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+def unknown(directory, name, mime):
+    path = os.path.join(str(directory), name)
+    with open(path, 'w') as fp:
+        fp.write(mime + '\nsome content\n')
+    return path
+
+
+def test_batches_keep_order(tmp_path):
+    paths = [unknown(tmp_path, 'file%d' % i, 'text/x-fake%d' % i)
+             for i in range(10)]
+    fallback = filetype_.FileFallback(
+        window=3, command=command(tmp_path, 'file', FAKE_FILE))
+    with fallback:
+        kinds = fallback.guess_many(paths)
+        assert [kind.mime for kind in kinds] == [
+            'text/x-fake%d' % i for i in range(10)]
+        assert fallback.guess_many(paths) == kinds
+    assert fallback.info() == {'hits': 10, 'misses': 10, 'spawns': 1,
+                               'size': 10, 'maxsize': 65536}
+
+
+def test_registered_and_unknown_mimes(tmp_path):
+    png = unknown(tmp_path, 'png', 'image/png')
+    data = unknown(tmp_path, 'data', 'application/octet-stream')
+    missing = os.path.join(str(tmp_path), 'missing')
+    with filetype_.FileFallback(
+            command=command(tmp_path, 'file', FAKE_FILE)) as fallback:
+        assert fallback.guess_many([png, data, missing]) == [
+            filetype_.get_type(ext='png'), None, None]
+
+
+def test_newline_paths(tmp_path):
+    paths = [unknown(tmp_path, 'a\nb', 'text/x-newline'),
+             unknown(tmp_path, 'plain', 'text/x-plain')]
+    with filetype_.FileFallback(
+            command=command(tmp_path, 'file', FAKE_FILE)) as fallback:
+        assert [kind.mime for kind in fallback.guess_many(paths)] == [
+            'text/x-newline', 'text/x-plain']
+        assert fallback.spawns == 2
+
+
+def test_dead_command_is_not_cached(tmp_path):
+    path = unknown(tmp_path, 'data', 'text/x-fake')
+    newline = unknown(tmp_path, 'a\nb', 'text/x-fake')
+    fallback = filetype_.FileFallback(
+        command=command(tmp_path, 'dead', DEAD_FILE))
+    with fallback:
+        assert fallback.guess_many([path, newline]) == [None, None]
+        assert fallback.info()['size'] == 0
+
+        fallback.command = command(tmp_path, 'file', FAKE_FILE)
+        kinds = fallback.guess_many([path, newline])
+        assert [kind.mime for kind in kinds] == ['text/x-fake'] * 2
+        assert fallback.info()['size'] == 2
+
+
+def test_guess_path_and_scan(tmp_path):
+    gif = tmp_path / 'a.gif'
+    gif.write_bytes(b'GIF89a' + bytes(10))
+    paths = [str(gif)] + [unknown(tmp_path, 'b%d' % i, 'text/x-fake%d' % i)
+                          for i in range(5)]
+    with filetype_.FileFallback(
+            command=command(tmp_path, 'file', FAKE_FILE)) as fallback:
+        assert filetype_.guess_path(str(gif), fallback=fallback).extension \
+            == 'gif'
+        assert fallback.spawns == 0
+        assert filetype_.guess_path(paths[1], fallback=fallback).mime == \
+            'text/x-fake0'
+
+        expected = [path for path, _ in filetype_.scan(str(tmp_path))]
+        results = list(filetype_.scan(str(tmp_path), workers=2,
+                                      include=['*.gif', 'b*'],
+                                      fallback=fallback))
+        assert [path for path, _ in results] == [
+            path for path in expected if path in paths]
+        for path, kind in results:
+            assert kind.mime == ('image/gif' if path == str(gif) else
+                                 open(path).readline().strip())
+
+
+class Recorder(object):
+
+    def __init__(self):
+        self.batches = []
+
+    def guess_many(self, paths):
+        self.batches.append(list(paths))
+        return ['kind of ' + path for path in paths]
+
+
+def test_with_fallback_order():
+    results = [('p%d' % i, 'known' if i % 3 == 0 else None, i)
+               for i in range(10)]
+    recorder = Recorder()
+    resolved = list(filetype_._with_fallback(
+        iter(results), recorder, lambda result: result[1] is None, window=2))
+    assert resolved == [
+        ('p%d' % i, 'known' if i % 3 == 0 else 'kind of p%d' % i, i)
+        for i in range(10)]
+    assert recorder.batches == [['p1', 'p2'], ['p4', 'p5'], ['p7', 'p8']]
@@ -0,0 +1,47 @@
+import filetype_
+
+
+class Custom(filetype_.Type):
+    __slots__ = ()
+    SIGNATURES = (filetype_.Signature((0, b'\xFF\xD8\xFF\xE0')),)
+
+    def __init__(self, extension):
+        super(Custom, self).__init__('application/x-' + extension, extension)
+
+
+def test_latest_added_type_wins_ties():
+    registry = filetype_.Registry([filetype_.Jpeg()])
+    registry.add(Custom('first'))
+    registry.add(Custom('second'))
+    assert [kind.extension for kind in registry] == ['second', 'first', 'jpg']
+    assert filetype_.match(b'\xFF\xD8\xFF\xE0', registry).extension == 'second'
+
+    registry.add(Custom('low'), priority=-1)
+    registry.add(Custom('high'), priority=1)
+    assert [kind.extension for kind in registry] == [
+        'high', 'second', 'first', 'jpg', 'low']
+
+
+def test_add_type_takes_precedence():
+    first, second = Custom('first'), Custom('second')
+    filetype_.add_type(first)
+    filetype_.add_type(second)
+    try:
+        assert filetype_.guess(b'\xFF\xD8\xFF\xE0') is second
+    finally:
+        filetype_.TYPES.remove(first)
+        filetype_.TYPES.remove(second)
+    assert filetype_.guess(b'\xFF\xD8\xFF\xE0').extension == 'jpg'
+
+
+def test_lookups_reject_non_str():
+    jpeg = filetype_.get_type(ext='jpg')
+    for value in (None, 1, b'jpg'):
+        assert filetype_.is_extension_supported(value) is False
+        assert filetype_.is_mime_supported(value) is False
+        assert jpeg.is_extension(value) is False
+        assert jpeg.is_mime(value) is False
+        assert filetype_.TYPES.by_extension(value) == ()
+        assert filetype_.TYPES.by_mime(value) == ()
+    assert filetype_.is_extension_supported('.JPG') is True
+    assert jpeg.is_mime('image/jpeg; charset=binary') is True
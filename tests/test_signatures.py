@@ -0,0 +1,182 @@
+import random
+
+import filetype_
+
+
+def _is(buf, offset, data):
+    return all(buf[offset + i] == byte for i, byte in enumerate(data))
+
+
+# The hand-written byte comparisons the built-in matchers were made of
+# before they were described with signatures, in their original order.
+LEGACY = [
+    ('jpg', lambda buf: len(buf) > 2 and _is(buf, 0, b'\xFF\xD8\xFF')),
+    ('png', lambda buf: len(buf) > 3 and _is(buf, 0, b'\x89PNG')),
+    ('gif', lambda buf: len(buf) > 2 and _is(buf, 0, b'GIF')),
+    ('webp', lambda buf: len(buf) > 11 and _is(buf, 8, b'WEBP')),
+    ('cr2', lambda buf: (len(buf) > 9 and
+                         (_is(buf, 0, b'II*\x00') or
+                          _is(buf, 0, b'MM\x00*')) and
+                         _is(buf, 8, b'CR'))),
+    ('tif', lambda buf: (len(buf) > 3 and
+                         (_is(buf, 0, b'II*\x00') or
+                          _is(buf, 0, b'MM\x00*')))),
+    ('bmp', lambda buf: len(buf) > 1 and _is(buf, 0, b'BM')),
+    ('jxr', lambda buf: len(buf) > 2 and _is(buf, 0, b'II\xBC')),
+    ('psd', lambda buf: len(buf) > 3 and _is(buf, 0, b'8BPS')),
+    ('ico', lambda buf: len(buf) > 3 and _is(buf, 0, b'\x00\x00\x01\x00')),
+    ('mp4', lambda buf: (len(buf) > 27 and
+                         (_is(buf, 0, b'\x00\x00\x00') and
+                          buf[3] in (0x18, 0x20) and _is(buf, 4, b'ftyp') or
+                          _is(buf, 0, b'3gp5') or
+                          _is(buf, 0, b'\x00\x00\x00\x1Cftypmp42') and
+                          _is(buf, 16, b'mp41mp42isom')))),
+    ('m4v', lambda buf: (len(buf) > 10 and
+                         _is(buf, 0, b'\x00\x00\x00\x1CftypM4V'))),
+    ('mkv', lambda buf: (len(buf) > 15 and
+                         _is(buf, 0, b'\x1A\x45\xDF\xA3\x93\x42\x82\x88'
+                             b'matroska') or
+                         len(buf) > 38 and _is(buf, 31, b'matroska'))),
+    ('webm', lambda buf: len(buf) > 3 and _is(buf, 0, b'\x1A\x45\xDF\xA3')),
+    ('mov', lambda buf: (len(buf) > 7 and
+                         _is(buf, 0, b'\x00\x00\x00\x14ftyp'))),
+    ('avi', lambda buf: (len(buf) > 10 and _is(buf, 0, b'RIFF') and
+                         _is(buf, 8, b'AVI'))),
+    ('wmv', lambda buf: (len(buf) > 9 and
+                         _is(buf, 0, b'\x30\x26\xB2\x75\x8E\x66\xCF\x11'
+                             b'\xA6\xD9'))),
+    ('flv', lambda buf: len(buf) > 3 and _is(buf, 0, b'FLV\x01')),
+    ('mpg', lambda buf: (len(buf) > 3 and _is(buf, 0, b'\x00\x00\x01') and
+                         0xB0 <= buf[3] <= 0xBF)),
+    ('midi', lambda buf: len(buf) > 3 and _is(buf, 0, b'MThd')),
+    ('mp3', lambda buf: (len(buf) > 2 and
+                         (_is(buf, 0, b'ID3') or _is(buf, 0, b'\xFF\xFB')))),
+    ('m4a', lambda buf: (len(buf) > 10 and
+                         (_is(buf, 4, b'ftypM4A') or _is(buf, 0, b'M4A ')))),
+    ('ogg', lambda buf: len(buf) > 3 and _is(buf, 0, b'OggS')),
+    ('flac', lambda buf: len(buf) > 3 and _is(buf, 0, b'fLaC')),
+    ('wav', lambda buf: (len(buf) > 11 and _is(buf, 0, b'RIFF') and
+                         _is(buf, 8, b'WAVE'))),
+    ('amr', lambda buf: len(buf) > 11 and _is(buf, 0, b'#!AMR\n')),
+    ('woff', lambda buf: (len(buf) > 7 and
+                          _is(buf, 0, b'wOFF\x00\x01\x00\x00'))),
+    ('woff2', lambda buf: (len(buf) > 7 and
+                           _is(buf, 0, b'wOF2\x00\x01\x00\x00'))),
+    ('ttf', lambda buf: (len(buf) > 4 and
+                         _is(buf, 0, b'\x00\x01\x00\x00\x00'))),
+    ('otf', lambda buf: len(buf) > 4 and _is(buf, 0, b'OTTO\x00')),
+    ('epub', lambda buf: (len(buf) > 57 and _is(buf, 0, b'PK\x03\x04') and
+                          _is(buf, 30, b'mimetypeapplication/epub+zip'))),
+    ('zip', lambda buf: (len(buf) > 3 and _is(buf, 0, b'PK') and
+                         buf[2] in (0x3, 0x5, 0x7) and
+                         buf[3] in (0x4, 0x6, 0x8))),
+    ('tar', lambda buf: len(buf) > 261 and _is(buf, 257, b'ustar')),
+    ('rar', lambda buf: (len(buf) > 6 and _is(buf, 0, b'Rar!\x1A\x07') and
+                         buf[6] in (0x0, 0x1))),
+    ('gz', lambda buf: len(buf) > 2 and _is(buf, 0, b'\x1F\x8B\x08')),
+    ('bz2', lambda buf: len(buf) > 2 and _is(buf, 0, b'BZh')),
+    ('7z', lambda buf: (len(buf) > 5 and
+                        _is(buf, 0, b'7z\xBC\xAF\x27\x1C'))),
+    ('pdf', lambda buf: len(buf) > 3 and _is(buf, 0, b'%PDF')),
+    ('exe', lambda buf: len(buf) > 1 and _is(buf, 0, b'MZ')),
+    ('swf', lambda buf: (len(buf) > 2 and buf[0] in (0x43, 0x46) and
+                         _is(buf, 1, b'WS'))),
+    ('rtf', lambda buf: len(buf) > 4 and _is(buf, 0, b'{\\rtf')),
+    ('nes', lambda buf: len(buf) > 3 and _is(buf, 0, b'NES\x1A')),
+    ('crx', lambda buf: len(buf) > 3 and _is(buf, 0, b'Cr24')),
+    ('cab', lambda buf: (len(buf) > 3 and
+                         (_is(buf, 0, b'MSCF') or _is(buf, 0, b'ISc(')))),
+    ('eot', lambda buf: (len(buf) > 35 and _is(buf, 34, b'LP') and
+                         (_is(buf, 8, b'\x02\x00\x01') or
+                          _is(buf, 8, b'\x01\x00\x00') or
+                          _is(buf, 8, b'\x02\x00\x02')))),
+    ('ps', lambda buf: len(buf) > 1 and _is(buf, 0, b'%!')),
+    ('xz', lambda buf: len(buf) > 5 and _is(buf, 0, b'\xFD7zXZ\x00')),
+    ('sqlite', lambda buf: len(buf) > 3 and _is(buf, 0, b'SQLi')),
+    ('deb', lambda buf: (len(buf) > 20 and
+                         _is(buf, 0, b'!<arch>\ndebian-binary'))),
+    ('ar', lambda buf: len(buf) > 6 and _is(buf, 0, b'!<arch>')),
+    ('Z', lambda buf: (len(buf) > 1 and
+                       (_is(buf, 0, b'\x1F\xA0') or _is(buf, 0, b'\x1F\x9D')))),
+    ('lz', lambda buf: len(buf) > 3 and _is(buf, 0, b'LZIP')),
+]
+
+
+def samples(rng):
+    # Contents made from every signature, then mutated, truncated,
+    # extended or replaced, so that most comparisons are exercised.
+    seeds = []
+    for kind in filetype_.TYPES:
+        for sig in kind.SIGNATURES:
+            buf = bytearray(rng.getrandbits(8) for _ in range(sig.length))
+            for offset, pattern, mask in sig.runs:
+                for i, byte in enumerate(pattern):
+                    if mask is not None:
+                        byte |= rng.getrandbits(8) & ~mask[i] & 0xFF
+                    buf[offset + i] = byte
+            seeds.append(bytes(buf))
+
+    yield b''
+    for seed in seeds:
+        yield seed
+    for _ in range(4000):
+        buf = bytearray(rng.choice(seeds))
+        draw = rng.random()
+        if draw < 0.3:
+            buf[rng.randrange(len(buf))] = rng.getrandbits(8)
+        elif draw < 0.5:
+            del buf[rng.randrange(len(buf) + 1):]
+        elif draw < 0.7:
+            buf += bytes(rng.getrandbits(8)
+                         for _ in range(rng.randrange(300)))
+        elif draw < 0.8:
+            buf = bytearray(rng.getrandbits(8)
+                            for _ in range(rng.randrange(300)))
+        yield bytes(buf[:filetype_.DEFAULT_HEADER_SIZE])
+
+
+def test_signatures_match_legacy_comparisons():
+    for buf in samples(random.Random(0)):
+        for ext, legacy in LEGACY:
+            kind = filetype_.get_type(ext=ext)
+            expected = legacy(buf)
+            assert kind.match(buf) == expected, (ext, buf)
+            assert kind.match(bytearray(buf)) == expected, (ext, buf)
+            assert kind.match(memoryview(buf)) == expected, (ext, buf)
+            assert kind.check(buf, complete=True) == expected, (ext, buf)
+
+
+def test_match_agrees_with_legacy_order():
+    for buf in samples(random.Random(1)):
+        expected = next((ext for ext, legacy in LEGACY if legacy(buf)), None)
+        kind = filetype_.match(buf)
+        assert (kind.extension if kind else None) == expected, buf
+
+
+def test_check_decides_partial_headers():
+    # A complete match is only reported once every run has arrived.
+    tar = filetype_.get_type(ext='tar')
+    header = bytes(257) + b'ustar'
+    assert tar.check(header[:100]) is None
+    assert tar.check(header[:100], complete=True) is False
+    assert tar.check(header[:258] + b'x') is False
+    assert tar.check(header) is True
+
+
+def test_refining_types_are_tried_first():
+    registry = filetype_.Registry([
+        filetype_.Zip(), filetype_.Tiff(), filetype_.Webm(), filetype_.Ar(),
+        filetype_.Epub(), filetype_.Cr2(), filetype_.Mkv(), filetype_.Deb(),
+        filetype_.Jpeg(), filetype_.Tar()])
+    assert [kind.extension for kind in registry] == [
+        'epub', 'zip', 'cr2', 'tif', 'mkv', 'webm', 'deb', 'ar', 'jpg', 'tar']
+
+    epub = b'PK\x03\x04' + bytes(26) + b'mimetypeapplication/epub+zip'
+    cr2 = b'II*\x00\x10\x00\x00\x00CR'
+    mkv = b'\x1A\x45\xDF\xA3\x93\x42\x82\x88matroska'
+    deb = b'!<arch>\ndebian-binary'
+    jpeg = b'\xFF\xD8\xFF\xE0' + bytes(253) + b'ustar'
+    for buf, ext in ((epub, 'epub'), (cr2, 'cr2'), (mkv, 'mkv'),
+                     (deb, 'deb'), (jpeg, 'jpg')):
+        assert filetype_.match(buf, registry).extension == ext
+        assert filetype_.match(buf).extension == ext
@@ -0,0 +1,70 @@
+import io
+
+import pytest
+
+import filetype_
+
+GIF = b'GIF89a' + bytes(10)
+PNG = b'\x89PNG' + bytes(10)
+
+
+@pytest.fixture
+def stats():
+    stats = filetype_.Stats()
+    yield stats
+    stats.disable()
+
+
+def test_disabled_by_default(stats):
+    filetype_.guess(GIF)
+    assert stats.snapshot() == {'matchers': {}, 'reads': {}, 'results': {}}
+
+
+def test_counts(stats, tmp_path):
+    path = tmp_path / 'a.gif'
+    path.write_bytes(GIF)
+    stats.enable()
+    filetype_.guess(GIF)
+    filetype_.guess(str(path))
+    filetype_.guess(io.BytesIO(PNG))
+    filetype_.guess(memoryview(b'unknown'))
+    stats.disable()
+    filetype_.guess(GIF)
+
+    snapshot = stats.snapshot()
+    assert snapshot['results'] == {'gif': 2, 'png': 1, None: 1}
+    assert {source: entry['count']
+            for source, entry in snapshot['reads'].items()} == {
+        'bytes': 1, 'path': 1, 'file-like': 1, 'memoryview': 1}
+    assert snapshot['reads']['bytes']['bytes'] == len(GIF)
+    assert snapshot['matchers']['gif']['calls'] == 2
+    assert snapshot['matchers']['gif']['hits'] == 2
+    assert snapshot['matchers']['png']['hits'] == 1
+    assert all(entry['ns'] >= 0 for entry in snapshot['matchers'].values())
+
+
+def test_batches_are_counted(stats):
+    stats.enable()
+    list(filetype_.guess_many([GIF, PNG, None]))
+    filetype_.match_codes([GIF, b'x'], vectorize=False)
+    assert stats.snapshot()['results'] == {'gif': 2, 'png': 1, None: 1}
+
+
+def test_snapshot_reset(stats):
+    stats.enable()
+    filetype_.guess(GIF)
+    assert stats.snapshot(reset=True)['results'] == {'gif': 1}
+    assert stats.snapshot()['results'] == {}
+    filetype_.guess(PNG)
+    stats.reset()
+    assert stats.snapshot() == {'matchers': {}, 'reads': {}, 'results': {}}
+
+
+def test_tracer(stats):
+    events = []
+    stats.enable(tracer=lambda *event: events.append(event))
+    filetype_.guess(PNG)
+    assert [event[0] for event in events] == ['read', 'match', 'result']
+    assert events[0][1:3] == ('bytes', len(PNG))
+    assert events[1][1:3] == (filetype_.get_type(ext='png'), True)
+    assert events[2][1:3] == (filetype_.get_type(ext='png'), 1)
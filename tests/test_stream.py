@@ -0,0 +1,80 @@
+import io
+import os
+import random
+
+import filetype_
+from test_custom import Trailer
+
+GIF = b'GIF89a' + bytes(10)
+
+
+class Trickle(object):
+    # A pipe-like stream returning at most 5 bytes per read,
+    # without readinto().
+
+    def __init__(self, content):
+        self._fp = io.BytesIO(content)
+        self.closed = False
+
+    def read(self, size=-1):
+        return self._fp.read(5 if size is None or size < 0 else min(size, 5))
+
+    def tell(self):
+        return self._fp.tell()
+
+    def close(self):
+        self.closed = True
+
+
+def content(size=5000):
+    return GIF + bytes(random.Random(7).getrandbits(8) for _ in range(size))
+
+
+def test_short_reads_are_replayed():
+    data = content()
+    kind, reader = filetype_.guess_stream(Trickle(data))
+    assert kind.extension == 'gif'
+    assert reader.read() == data
+
+    kind, reader = filetype_.guess_stream(Trickle(data))
+    chunks = iter(lambda: reader.read(7), b'')
+    assert b''.join(chunks) == data
+
+
+def test_readinto_streams():
+    data = content()
+    stream = io.BytesIO(data)
+    kind, reader = filetype_.guess_stream(stream)
+    assert kind.extension == 'gif'
+    assert stream.tell() == filetype_.DEFAULT_HEADER_SIZE
+    assert reader.read(3) == data[:3]
+    assert reader.read() == data[3:]
+
+    kind, reader = filetype_.guess_stream(io.BytesIO(b'short'))
+    assert kind is None
+    assert reader.read() == b'short'
+
+
+def test_extended_header_is_replayed():
+    trailer = Trailer()
+    matchers = filetype_.Registry([filetype_.Jpeg(), trailer])
+    data = b'TR' + bytes(998) + b'TRAILER' + bytes(range(256)) * 10
+    stream = Trickle(data)
+    kind, reader = filetype_.guess_stream(stream, matchers)
+    assert kind is trailer
+    assert stream.tell() > filetype_.DEFAULT_HEADER_SIZE
+    assert reader.read() == data
+
+    reader.close()
+    assert stream.closed
+
+
+def test_pipe():
+    data = content(20000)
+    read_fd, write_fd = os.pipe()
+    with open(write_fd, 'wb') as fp:
+        fp.write(data)
+    with open(read_fd, 'rb', buffering=0) as fp:
+        kind, reader = filetype_.guess_stream(fp)
+        assert kind.extension == 'gif'
+        assert reader.read() == data
@@ -0,0 +1,24 @@
+import pytest
+
+import filetype_
+
+PNG = b'\x89PNG' + bytes(10)
+
+
+def test_verify():
+    assert filetype_.verify(PNG, ext='png')
+    assert filetype_.verify(PNG, ext='.PNG', mime='image/png')
+    result = filetype_.verify(PNG, ext='jpg')
+    assert result.status == filetype_.MISMATCH
+    assert result.kind.extension == 'png'
+    assert filetype_.verify(PNG, ext='png', mime='image/jpeg').status == \
+        filetype_.MISMATCH
+    assert filetype_.verify(b'unknown', ext='png').status == filetype_.UNKNOWN
+    assert filetype_.verify(b'', ext='png').status == filetype_.UNKNOWN
+
+
+def test_verify_needs_a_claim():
+    with pytest.raises(ValueError):
+        filetype_.verify(PNG)
+    with pytest.raises(ValueError):
+        filetype_.verify(b'')
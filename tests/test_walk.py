@@ -0,0 +1,89 @@
+import os
+import shutil
+
+import pytest
+
+import filetype_
+
+GIF = b'GIF89a' + bytes(10)
+PNG = b'\x89PNG' + bytes(12)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name, content in [('a.gif', GIF), ('sub/b.png', PNG),
+                          ('sub/deep/c.txt', b'text'),
+                          ('skip/d.gif', GIF)]:
+        path = tmp_path.joinpath(*name.split('/'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    return tmp_path
+
+
+def walk(root, **kwargs):
+    return sorted(os.path.relpath(path, str(root)).replace(os.sep, '/')
+                  for path in filetype_.walk_files(root, **kwargs))
+
+
+def test_max_depth(tree):
+    assert walk(tree, max_depth=0) == ['a.gif']
+    assert walk(tree, max_depth=1) == ['a.gif', 'skip/d.gif', 'sub/b.png']
+    assert walk(tree) == ['a.gif', 'skip/d.gif', 'sub/b.png',
+                          'sub/deep/c.txt']
+
+
+def test_globs(tree):
+    assert walk(tree, include=['*.gif']) == ['a.gif', 'skip/d.gif']
+    assert walk(tree, include=['sub/*.png']) == ['sub/b.png']
+    assert walk(tree, exclude=['skip', '*.txt']) == ['a.gif', 'sub/b.png']
+    assert walk(tree, exclude=['sub/deep']) == ['a.gif', 'skip/d.gif',
+                                                'sub/b.png']
+    assert walk(tree, include=['*.gif'], exclude=['skip']) == ['a.gif']
+
+
+def test_symlink_loops(tree):
+    try:
+        os.symlink(str(tree), str(tree / 'sub' / 'loop'))
+        os.symlink(str(tree / 'a.gif'), str(tree / 'link.gif'))
+    except (OSError, NotImplementedError):
+        pytest.skip('symbolic links are not supported')
+
+    assert walk(tree) == ['a.gif', 'skip/d.gif', 'sub/b.png',
+                          'sub/deep/c.txt']
+    assert walk(tree, follow_symlinks=True) == [
+        'a.gif', 'link.gif', 'skip/d.gif', 'sub/b.png', 'sub/deep/c.txt']
+
+
+def test_onerror(tree):
+    errors = []
+    assert walk(tree / 'missing', onerror=errors.append) == []
+    assert len(errors) == 1 and isinstance(errors[0], FileNotFoundError)
+
+    # Directories are only read once the root is listed, the
+    # subdirectories removed by then are reported.
+    errors = []
+    paths = filetype_.walk_files(tree, exclude=['skip'],
+                                 onerror=errors.append)
+    assert next(paths) == str(tree / 'a.gif')
+    shutil.rmtree(str(tree / 'sub'))
+    assert list(paths) == []
+    assert len(errors) == 1 and isinstance(errors[0], FileNotFoundError)
+
+    errors = []
+    results = filetype_.scan(tree, workers=1, onerror=errors.append)
+    assert next(results)[0] == str(tree / 'a.gif')
+    shutil.rmtree(str(tree / 'skip'))
+    assert list(results) == []
+    assert len(errors) == 1
+
+
+def test_scan_keeps_walk_order(tmp_path):
+    contents = [GIF, PNG, b'unknown', b'\xFF\xD8\xFF\xE0' + bytes(10)]
+    for index in range(50):
+        (tmp_path / ('%02d' % index)).write_bytes(contents[index % 4])
+    for workers in (1, 2, 8):
+        results = list(filetype_.scan(tmp_path, workers=workers))
+        assert [path for path, _ in results] == list(
+            filetype_.walk_files(tmp_path))
+        assert [kind for _, kind in results] == [
+            filetype_.guess(path) for path, _ in results]